@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator, InvalidPage
+from django.db import models
+
+from utils.pagination import DEFAULT_ESTIMATE_COUNT_THRESHOLD, estimated_count
+from utils.rendering import field_to_string
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which uses planner estimated counts above a threshold.
+    """
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, threshold=None):
+        super(EstimatedCountPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.threshold = threshold
+
+    def _get_count(self):
+        if self._count is None:
+            self._count = estimated_count(self.object_list, self.threshold)
+        return self._count
+    count = property(_get_count)
+
+class RenderedColumn(object):
+    """A changelist column which renders a model field through field_to_string.
+    """
+    allow_tags = True
+
+    def __init__(self, field):
+        self.field = field
+        self.field_name = field.name
+        self.short_description = field.verbose_name
+        self.admin_order_field = field.name
+        self.__name__ = str(field.name)
+
+    def __call__(self, obj):
+        return field_to_string(self.field, obj)
+
+class ERPChangeList(ChangeList):
+    """ChangeList which doesn't scale with the size of the table.
+
+    The foreign keys shown in the list are explicitly fetched with
+    select_related (nullable ones too) and the filtered/unfiltered totals are
+    estimated when bigger than "estimated_count_threshold".
+    """
+    def __init__(self, request, model, list_display, list_display_links, *args, **kwargs):
+        list_display_links = [self._get_column(list_display, name) for name in list_display_links or ()]
+        super(ERPChangeList, self).__init__(request, model, list_display, list_display_links, *args, **kwargs)
+
+    def _get_column(self, list_display, name):
+        for column in list_display:
+            if getattr(column, 'field_name', None) == name:
+                return column
+        return name
+
+    def get_query_set(self, request):
+        qs = super(ERPChangeList, self).get_query_set(request)
+        related = []
+        for column in self.list_display:
+            name = getattr(column, 'field_name', column)
+            try:
+                field = self.lookup_opts.get_field(name)
+            except (models.FieldDoesNotExist, TypeError):
+                continue
+            if isinstance(field.rel, models.ManyToOneRel):
+                related.append(name)
+        if related:
+            qs = qs.select_related(*related)
+        return qs
+
+    def get_results(self, request):
+        threshold = self.model_admin.estimated_count_threshold
+        paginator = self.model_admin.get_paginator(request, self.query_set, self.list_per_page)
+        result_count = paginator.count
+
+        if not self.query_set.query.where:
+            full_result_count = result_count
+        else:
+            full_result_count = estimated_count(self.root_query_set, threshold)
+
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+
+        if (self.show_all and can_show_all) or not multi_page:
+            result_list = self.query_set._clone()
+        else:
+            try:
+                result_list = paginator.page(self.page_num + 1).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+
+        self.result_count = result_count
+        self.full_result_count = full_result_count
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+        self.paginator = paginator
+
+class ModelAdmin(admin.ModelAdmin):
+    """Base ModelAdmin for ERP models with big tables.
+
+    Counts are estimated by the database planner when bigger than
+    "estimated_count_threshold" (so the pagination may be approximate),
+    foreign keys in "list_display" are fetched in the same query and the
+    cells of model fields are rendered through djangoerp.core.utils.rendering.
+    """
+    estimated_count_threshold = DEFAULT_ESTIMATE_COUNT_THRESHOLD
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page, self.estimated_count_threshold)
+
+    def get_list_display(self, request):
+        list_display = []
+        for name in super(ModelAdmin, self).get_list_display(request):
+            column = name
+            if isinstance(name, basestring) and name not in self.list_editable:
+                try:
+                    column = RenderedColumn(self.model._meta.get_field(name))
+                except models.FieldDoesNotExist:
+                    pass
+            list_display.append(column)
+        return list_display
+
+    def get_changelist(self, request, **kwargs):
+        return ERPChangeList
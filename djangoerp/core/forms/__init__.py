@@ -15,14 +15,155 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
+import warnings
+from django import forms
+from django.forms.forms import BoundField, DeclarativeFieldsMetaclass, pretty_name
+from django.forms.models import ModelFormMetaclass
+from django.utils.datastructures import SortedDict
+from django.utils.functional import Promise
+from django.utils.html import conditional_escape, format_html
+
+class FieldRenderPlan(object):
+    """Rendering data of a form field which doesn't depend on form instances.
+
+    Lazy (translated) labels are escaped at render time, in the active
+    language.
+    """
+    def __init__(self, form_class, name, field):
+        self.name = name
+        self.field_label = field.label
+        self.required = field.required
+        self.label = pretty_name(name) if field.label is None else field.label
+        self._label_html = None
+        if not isinstance(self.label, Promise):
+            self._label_html = conditional_escape(self.label)
+        self.css_classes = ''
+        if field.required and hasattr(form_class, 'required_css_class'):
+            self.css_classes = form_class.required_css_class
+
+    @property
+    def label_html(self):
+        if self._label_html is None:
+            return conditional_escape(self.label)
+        return self._label_html
+
+    def matches(self, field):
+        """Checks the plan is still valid for the (maybe customized) field.
+        """
+        return field.label == self.field_label and field.required == self.required
+
+def build_render_plan(form_class):
+    """Returns the rendering plans of the fields of form_class, in field order.
+    """
+    plan = SortedDict()
+    for name, field in form_class.base_fields.items():
+        plan[name] = FieldRenderPlan(form_class, name, field)
+    return plan
+
+def get_render_plan(form_class):
+    """Returns the rendering plans of the fields of form_class.
+
+    They are built when the class is created (see RichFormMetaclass) or, for
+    classes created otherwise, on first use.
+    """
+    plan = form_class.__dict__.get('_render_plan')
+    if plan is None:
+        plan = build_render_plan(form_class)
+        form_class._render_plan = plan
+    return plan
+
+class RichBoundField(BoundField):
+    """BoundField which renders labels and CSS classes from a FieldRenderPlan.
+    """
+    def __init__(self, form, field, name, plan):
+        super(RichBoundField, self).__init__(form, field, name)
+        self.plan = plan
+        self.label = plan.label
+
+    def css_classes(self, extra_classes=None):
+        if extra_classes:
+            return super(RichBoundField, self).css_classes(extra_classes)
+        if self.errors and hasattr(self.form, 'error_css_class'):
+            return ' '.join([c for c in (self.plan.css_classes, self.form.error_css_class) if c])
+        return self.plan.css_classes
+
+    def label_tag(self, contents=None, attrs=None):
+        widget = self.field.widget
+        id_ = widget.attrs.get('id') or self.auto_id
+        if contents or attrs or not id_:
+            return super(RichBoundField, self).label_tag(contents, attrs)
+        return format_html('<label for="{0}">{1}</label>', widget.id_for_label(id_), self.plan.label_html)
+
 class RichForm(object):
     """Mix-in to make rich forms.
+
+    Bound fields are created once per form instance and render their labels
+    and CSS classes from the rendering plan of the form class.
     """
     required_css_class = 'required'
     error_css_class = 'errors'
 
+    def __getitem__(self, name):
+        cache = self.__dict__.setdefault('_bound_fields_cache', {})
+        bound_field = cache.get(name)
+        if bound_field is None:
+            try:
+                field = self.fields[name]
+            except KeyError:
+                raise KeyError('Key %r not found in Form' % name)
+            plan = get_render_plan(self.__class__).get(name)
+            if plan is not None and plan.matches(field):
+                bound_field = RichBoundField(self, field, name, plan)
+            else:
+                bound_field = BoundField(self, field, name)
+            cache[name] = bound_field
+        return bound_field
+
+class RichFormMetaclass(DeclarativeFieldsMetaclass):
+    """Form metaclass which builds the rendering plan of each new class.
+    """
+    def __new__(cls, name, bases, attrs):
+        new_class = super(RichFormMetaclass, cls).__new__(cls, name, bases, attrs)
+        new_class._render_plan = build_render_plan(new_class)
+        return new_class
+
+class RichModelFormMetaclass(ModelFormMetaclass):
+    """ModelForm metaclass which builds the rendering plan of each new class.
+    """
+    def __new__(cls, name, bases, attrs):
+        new_class = super(RichModelFormMetaclass, cls).__new__(cls, name, bases, attrs)
+        new_class._render_plan = build_render_plan(new_class)
+        return new_class
+
+class EnrichedForm(RichForm, forms.Form):
+    """Base class of rich forms.
+    """
+    __metaclass__ = RichFormMetaclass
+
+class EnrichedModelForm(RichForm, forms.ModelForm):
+    """Base class of rich model forms.
+    """
+    __metaclass__ = RichModelFormMetaclass
+
 def enrich_form(cls):
     """Makes the form richer with custom CSS classes for special fields.
+
+    DEPRECATED: inherit from EnrichedForm or EnrichedModelForm instead.
+
+    It returns a rich subclass of the given form class, created through the
+    rich metaclasses, so it must be used as class decorator (the given class
+    is left untouched):
+
+    @enrich_form
+    class MyForm(forms.Form):
+        ...
     """
-    if RichForm not in cls.__bases__:
-        cls.__bases__ += (RichForm,)
+    warnings.warn("enrich_form() is deprecated, inherit from EnrichedForm or EnrichedModelForm instead.", DeprecationWarning, stacklevel=2)
+    if issubclass(cls, RichForm):
+        return cls
+    attrs = {'__module__': cls.__module__, '__doc__': cls.__doc__}
+    for attr in ('required_css_class', 'error_css_class'):
+        if hasattr(cls, attr):
+            attrs[attr] = getattr(cls, attr)
+    metaclass = RichModelFormMetaclass if isinstance(cls, ModelFormMetaclass) else RichFormMetaclass
+    return metaclass(cls.__name__, (RichForm, cls), attrs)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import csv
+import json
+import pickle
+from itertools import islice
+from multiprocessing import Pool
+from django.db import connections, router, transaction, IntegrityError
+from django.utils.encoding import force_text
+
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+
+class ImportResult(object):
+    """Outcome of an import: counters and per-row errors.
+
+    Each error is a (row number, {field: [messages]}) pair; rows are numbered
+    from 1, not counting the CSV header.
+    """
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.errors = []
+
+def read_rows(fileobj, format='csv'):
+    """Yields the rows of fileobj as dictionaries.
+
+    Supported formats are "csv" (with a header line), "jsonl" (one JSON object
+    per line) and "json" (a list of objects). Only the latter is loaded at
+    once; the others are streamed.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(fileobj):
+            yield dict([(k.decode('utf-8'), (v or '').decode('utf-8')) for k, v in row.items() if k])
+    elif format == 'jsonl':
+        for line in fileobj:
+            if line.strip():
+                yield json.loads(line)
+    elif format == 'json':
+        for row in json.load(fileobj):
+            yield row
+    else:
+        raise ValueError("Unsupported import format: %s" % format)
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    start = 1
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            break
+        yield start, chunk
+        start += len(chunk)
+
+def _validate_chunk(args):
+    """Validates a chunk of rows, returning (number, instance, errors) triples.
+    """
+    form_class, start, rows = args
+    results = []
+    for number, row in enumerate(rows, start):
+        form = form_class(data=row)
+        if form.is_valid():
+            results.append((number, form.save(commit=False), None))
+        else:
+            errors = dict([(k, [force_text(e) for e in v]) for k, v in form.errors.items()])
+            results.append((number, None, errors))
+    return results
+
+def _save_chunk(model, using, valid, result):
+    """Writes the valid instances of a chunk with a single bulk_create.
+
+    If the chunk violates a DB constraint, its rows are saved one by one to
+    find the offending ones.
+    """
+    try:
+        with transaction.commit_on_success(using=using):
+            model._default_manager.db_manager(using).bulk_create([instance for number, instance in valid])
+        result.created += len(valid)
+    except IntegrityError:
+        for number, instance in valid:
+            try:
+                with transaction.commit_on_success(using=using):
+                    instance.save(using=using, force_insert=True)
+                result.created += 1
+            except IntegrityError as e:
+                result.errors.append((number, {'__all__': [force_text(e)]}))
+
+def _check_form_class(form_class, processes):
+    model = form_class._meta.model
+    m2m_fields = [f.name for f in model._meta.many_to_many if f.name in form_class.base_fields]
+    if m2m_fields:
+        raise ValueError("Many-to-many fields can't be bulk imported: %s" % ', '.join(m2m_fields))
+    if processes and processes > 1:
+        try:
+            pickle.dumps(form_class)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            raise ValueError("%s can't be sent to worker processes: it must be defined at module level." % form_class.__name__)
+
+def import_rows(form_class, rows, chunk_size=500, processes=None, progress=None, using=None):
+    """Validates rows through form_class and bulk creates the valid ones.
+
+    form_class must be a ModelForm without many-to-many fields (ValueError is
+    raised otherwise). Rows are validated in chunks, optionally by a pool of
+    processes, and each chunk is written in its own transaction. With
+    processes > 1, form_class is pickled to the workers, so it must be
+    importable (i.e. defined at module level). Invalid rows don't stop the
+    import: their errors are collected in the returned ImportResult.
+    progress, if given, is called with the result after each chunk.
+
+    NOTE: bulk_create doesn't call save() (neither the model's nor the
+    form's) nor send the save signals.
+    """
+    _check_form_class(form_class, processes)
+    model = form_class._meta.model
+    using = using or router.db_for_write(model)
+    result = ImportResult()
+    tasks = ((form_class, start, chunk) for start, chunk in _chunks(rows, chunk_size))
+
+    pool = None
+    if processes and processes > 1:
+        # Forked workers must not share the parent's connections.
+        for conn in connections.all():
+            conn.close()
+        pool = Pool(processes)
+
+    try:
+        if pool:
+            validated = pool.imap(_validate_chunk, tasks)
+        else:
+            validated = (_validate_chunk(task) for task in tasks)
+
+        for results in validated:
+            valid = []
+            for number, instance, errors in results:
+                if errors:
+                    result.errors.append((number, errors))
+                else:
+                    valid.append((number, instance))
+            if valid:
+                _save_chunk(model, using, valid, result)
+            result.processed += len(results)
+            if progress:
+                progress(result)
+
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    return result
+
+def import_file(form_class, fileobj, format='csv', **kwargs):
+    """Imports the rows of the given (i.e. uploaded) file. See import_rows.
+    """
+    return import_rows(form_class, read_rows(fileobj, format), **kwargs)
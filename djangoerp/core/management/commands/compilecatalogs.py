@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import trans_real
+
+from djangoerp.core.utils.translation import write_catalog, get_compiled_catalog_path
+
+class Command(NoArgsCommand):
+    help = "Compiles a single merged translation catalog for each language."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--path', action='store', dest='path', default=None,
+            help='Output directory (COMPILED_LOCALE_PATH by default).'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity'))
+        path = options.get('path') or settings.COMPILED_LOCALE_PATH
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        for language, name in settings.LANGUAGES:
+            # Always merge the catalogs from their sources.
+            trans_real._translations.pop(language, None)
+            translation = trans_real.translation(language)
+            catalog_path = get_compiled_catalog_path(language, path)
+            with open(catalog_path + '.tmp', 'wb') as f:
+                write_catalog(translation._catalog, translation._info, f)
+            os.rename(catalog_path + '.tmp', catalog_path)
+            if verbosity > 0:
+                self.stdout.write("Compiled %s (%d messages)." % (catalog_path, len(translation._catalog)))
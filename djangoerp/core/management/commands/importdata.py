@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.importlib import import_module
+
+from djangoerp.core.importers import IMPORT_FORMATS, import_file
+
+class Command(BaseCommand):
+    args = '<form_class_path> <file>'
+    help = "Imports the rows of a CSV/JSON file, validating them through the given (module level) ModelForm."
+    option_list = BaseCommand.option_list + (
+        make_option('--format', action='store', dest='format', default=None,
+            help='File format (%s). Guessed from the file extension by default.' % ', '.join(IMPORT_FORMATS)),
+        make_option('--chunk-size', action='store', type='int', dest='chunk_size', default=500,
+            help='Number of rows validated and written together.'),
+        make_option('--processes', action='store', type='int', dest='processes', default=None,
+            help='Number of processes validating the rows.'),
+        make_option('--max-errors', action='store', type='int', dest='max_errors', default=50,
+            help='Max number of row errors printed.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError("Usage: importdata %s" % self.args)
+
+        form_path, filename = args
+        module_name, sep, class_name = form_path.rpartition('.')
+        try:
+            form_class = getattr(import_module(module_name), class_name)
+        except (ImportError, AttributeError, ValueError):
+            raise CommandError("Can't import form class %s." % form_path)
+
+        format = options.get('format') or os.path.splitext(filename)[1].lstrip('.').lower()
+        if format not in IMPORT_FORMATS:
+            raise CommandError("Unsupported format: %s." % format)
+
+        verbosity = int(options.get('verbosity'))
+
+        def progress(result):
+            if verbosity > 1:
+                self.stdout.write("%d rows processed, %d created, %d errors ..." % (result.processed, result.created, len(result.errors)))
+
+        try:
+            with open(filename, 'rb') as fileobj:
+                result = import_file(form_class, fileobj, format,
+                    chunk_size=options.get('chunk_size'),
+                    processes=options.get('processes'),
+                    progress=progress)
+        except ValueError as e:
+            raise CommandError(e)
+
+        if verbosity > 0:
+            for number, errors in result.errors[:options.get('max_errors')]:
+                for field, messages in errors.items():
+                    self.stderr.write("Row %d, %s: %s" % (number, field, ' '.join(messages)))
+            self.stdout.write("%d rows processed, %d created, %d errors." % (result.processed, result.created, len(result.errors)))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import time
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+
+from djangoerp.core.reports import autodiscover, process_pending_jobs
+
+class Command(NoArgsCommand):
+    help = "Generates the pending reports."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', action='store', type='int', dest='workers', default=1,
+            help='Number of reports generated concurrently.'),
+        make_option('--limit', action='store', type='int', dest='limit', default=None,
+            help='Max number of reports generated by each run.'),
+        make_option('--loop', action='store', type='int', dest='loop', default=0,
+            help='Keeps polling for new jobs every LOOP seconds.'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity'))
+        loop = options.get('loop')
+
+        autodiscover()
+
+        while True:
+            processed = process_pending_jobs(options.get('limit'), options.get('workers'))
+            if verbosity > 0 and (processed or not loop):
+                self.stdout.write("Generated %d reports." % processed)
+            if not loop:
+                break
+            time.sleep(loop)
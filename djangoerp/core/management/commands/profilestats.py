@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+import glob
+import pstats
+from StringIO import StringIO
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    args = '[view_name_prefix]'
+    help = "Aggregates the dumped request profiles and prints the hottest functions."
+    option_list = BaseCommand.option_list + (
+        make_option('--path', action='store', dest='path', default=None,
+            help='Directory of the profiles (PROFILER_PATH by default).'),
+        make_option('--sort', action='store', dest='sort', default='cumulative',
+            help='Sort key (i.e. "cumulative", "time", "calls").'),
+        make_option('--limit', action='store', type='int', dest='limit', default=20,
+            help='Number of functions to print.'),
+    )
+
+    def handle(self, *args, **options):
+        path = options.get('path') or getattr(settings, 'PROFILER_PATH', None)
+        if not path:
+            raise CommandError("No profile directory given.")
+
+        prefix = args[0] if args else ''
+        filenames = sorted(glob.glob(os.path.join(path, '%s*.prof' % prefix)))
+        if not filenames:
+            raise CommandError("No profiles found in %s." % path)
+
+        output = StringIO()
+        stats = pstats.Stats(filenames[0], stream=output)
+        for filename in filenames[1:]:
+            stats.add(filename)
+        output.write("%d profiles aggregated.\n" % len(filenames))
+        stats.strip_dirs().sort_stats(options.get('sort')).print_stats(options.get('limit'))
+        self.stdout.write(output.getvalue())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+class Command(NoArgsCommand):
+    help = "Deletes expired sessions from the database, in batches."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', action='store', type='int', dest='batch_size', default=1000,
+            help='Number of sessions deleted by each query.'),
+    )
+
+    def handle_noargs(self, **options):
+        batch_size = options.get('batch_size')
+        verbosity = int(options.get('verbosity'))
+        now = timezone.now()
+        deleted = 0
+
+        while True:
+            keys = list(Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                break
+            Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if verbosity > 1:
+                self.stdout.write("Deleted %d expired sessions ..." % deleted)
+
+        if verbosity > 0:
+            self.stdout.write("Deleted %d expired sessions." % deleted)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+
+from djangoerp.core.search import autodiscover, get_registered_models, rebuild_index
+
+class Command(BaseCommand):
+    args = '[app_label.ModelName ...]'
+    help = "Rebuilds the global search index of the given (or all the registered) models."
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', action='store', type='int', dest='batch_size', default=500,
+            help='Number of objects indexed together.'),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity'))
+
+        autodiscover()
+
+        models = get_registered_models()
+        if args:
+            labels = dict([(('%s.%s' % (m._meta.app_label, m._meta.object_name)).lower(), m) for m in models])
+            try:
+                models = [labels[label.lower()] for label in args]
+            except KeyError as e:
+                raise CommandError("Model not registered for search: %s." % e.args[0])
+
+        for model in models:
+            def progress(done):
+                if verbosity > 1:
+                    self.stdout.write("%s: %d objects indexed ..." % (model._meta.object_name, done))
+            done = rebuild_index(model, options.get('batch_size'), progress)
+            if verbosity > 0:
+                self.stdout.write("%s: %d objects indexed." % (model._meta.object_name, done))
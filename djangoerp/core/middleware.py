@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+import re
+import time
+import uuid
+import random
+import cProfile
+import threading
+from django import http
+from django.conf import settings
+from django.core import signals
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, close_connection
+from django.contrib.sites.models import get_current_site
+from django.contrib.redirects.models import Redirect
+
+from routers import pin_to_primary
+
+REDIRECTS_VERSION_KEY = 'djangoerp.core.redirects.version'
+
+class RedirectTable(object):
+    """In-memory table of the redirects of each site.
+
+    The whole table of a site is loaded with a single query the first time it
+    is needed, so looking up a path (hit or miss) never touches the database.
+    Saving or deleting a Redirect bumps a version token stored in the default
+    cache, which makes every process reload its tables; REDIRECTS_MAX_AGE
+    (in seconds) bounds staleness when the cache is not shared.
+    """
+    def __init__(self):
+        self._tables = {}
+        self._version = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Discards the loaded tables in every process.
+        """
+        cache.set(REDIRECTS_VERSION_KEY, uuid.uuid4().hex, 30 * 24 * 3600)
+        self._tables = {}
+
+    def get_table(self, site_id):
+        version = cache.get(REDIRECTS_VERSION_KEY)
+        max_age = getattr(settings, 'REDIRECTS_MAX_AGE', 300)
+        if version != self._version or time.time() - self._loaded_at > max_age:
+            with self._lock:
+                self._tables = {}
+                self._version = version
+                self._loaded_at = time.time()
+
+        table = self._tables.get(site_id)
+        if table is None:
+            table = dict(Redirect.objects.filter(site__id=site_id).values_list('old_path', 'new_path'))
+            self._tables[site_id] = table
+        return table
+
+    def lookup(self, site_id, path):
+        """Returns the new path for the given old path, or None if not found.
+
+        An empty string means the resource is gone.
+        """
+        return self.get_table(site_id).get(path)
+
+redirect_table = RedirectTable()
+
+class RedirectFallbackMiddleware(object):
+    """Drop-in replacement of django.contrib.redirects' middleware.
+
+    It behaves the same, but resolves 404 responses against the in-memory
+    RedirectTable instead of querying the database.
+    """
+    def process_response(self, request, response):
+        if response.status_code != 404:
+            return response
+
+        site_id = get_current_site(request).id
+        full_path = request.get_full_path()
+        new_path = redirect_table.lookup(site_id, full_path)
+
+        if new_path is None and settings.APPEND_SLASH and not request.path.endswith('/'):
+            # Try appending a trailing slash.
+            path_len = len(request.path)
+            new_path = redirect_table.lookup(site_id, full_path[:path_len] + '/' + full_path[path_len:])
+
+        if new_path is not None:
+            if new_path == '':
+                return http.HttpResponseGone()
+            return http.HttpResponsePermanentRedirect(new_path)
+
+        return response
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+class ReplicaPinningMiddleware(object):
+    """Pins the reads to the primary database for read-your-writes.
+
+    Reads of unsafe requests (i.e. POST) go to the primary database, and so
+    do the reads of the same client for REPLICA_PIN_SECONDS after them, giving
+    the replicas time to catch up.
+    """
+    cookie_name = 'erp_primary'
+
+    def process_request(self, request):
+        pin_to_primary(request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(self.cookie_name, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        pin_to_primary(False)
+        return response
+
+def release_connections(**kwargs):
+    """Ends the open transactions, closing only the old or broken connections.
+    """
+    max_age = getattr(settings, 'DATABASE_CONN_MAX_AGE', 0)
+    now = time.time()
+
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        connected_at = getattr(conn, 'connected_at', None)
+        if connected_at is None:
+            connected_at = conn.connected_at = now
+        try:
+            conn._rollback()
+            usable = True
+        except Exception:
+            usable = False
+        if not usable or now - connected_at >= max_age:
+            conn.close()
+            conn.connected_at = None
+
+def check_connections(**kwargs):
+    """Closes the reused connections which are broken, so they're reopened.
+    """
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        try:
+            conn.connection.cursor().execute("SELECT 1")
+            conn._rollback()
+        except Exception:
+            conn.close()
+            conn.connected_at = None
+
+class PersistentConnectionMiddleware(object):
+    """Keeps database connections open between requests.
+
+    By default Django closes all connections at the end of each request.
+    When DATABASE_CONN_MAX_AGE (in seconds) is set, connections are reused
+    until that age instead; with DATABASE_CONN_HEALTH_CHECKS the reused ones
+    are pinged when a request starts, and dropped when broken.
+
+    It's only active at startup, so its position in MIDDLEWARE_CLASSES is
+    irrelevant.
+    """
+    def __init__(self):
+        if getattr(settings, 'DATABASE_CONN_MAX_AGE', 0):
+            signals.request_finished.disconnect(close_connection)
+            signals.request_finished.connect(release_connections, dispatch_uid="release_connections")
+            if getattr(settings, 'DATABASE_CONN_HEALTH_CHECKS', True):
+                signals.request_started.connect(check_connections, dispatch_uid="check_connections")
+        raise MiddlewareNotUsed
+
+class ProfilerMiddleware(object):
+    """Profiles a sample of the requests with cProfile.
+
+    A request is profiled when any of the following is true:
+
+     * it's picked by the 1-in-PROFILER_SAMPLE_RATE random sampling;
+     * its path matches the PROFILER_URL_PATTERN regular expression;
+     * its PROFILER_HEADER header (i.e. "HTTP_X_PROFILE") is set to the
+       (secret) value of PROFILER_HEADER_VALUE.
+
+    Profiles are dumped in PROFILER_PATH, named after the view, the elapsed
+    time and the process. See the "profilestats" command to aggregate them.
+    It's disabled unless PROFILER_PATH and at least one trigger are set.
+    """
+    def __init__(self):
+        self.path = getattr(settings, 'PROFILER_PATH', None)
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+        url_pattern = getattr(settings, 'PROFILER_URL_PATTERN', None)
+        self.url_pattern = url_pattern and re.compile(url_pattern)
+        self.header = getattr(settings, 'PROFILER_HEADER', None)
+        self.header_value = getattr(settings, 'PROFILER_HEADER_VALUE', None)
+
+        if not self.path or not (self.sample_rate or self.url_pattern or (self.header and self.header_value)):
+            raise MiddlewareNotUsed
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def should_profile(self, request):
+        if self.sample_rate and random.randint(1, self.sample_rate) == 1:
+            return True
+        if self.url_pattern and self.url_pattern.search(request.path):
+            return True
+        if self.header and self.header_value and request.META.get(self.header) == self.header_value:
+            return True
+        return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.should_profile(request):
+            view_name = getattr(view_func, '__name__', view_func.__class__.__name__)
+            request._profiler_view = '%s.%s' % (view_func.__module__, view_name)
+            request._profiler_start = time.time()
+            request._profiler = cProfile.Profile()
+            request._profiler.enable()
+
+    def process_response(self, request, response):
+        profiler = getattr(request, '_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            del request._profiler
+            elapsed = int((time.time() - request._profiler_start) * 1000)
+            view_name = re.sub(r'[^\w.]', '_', request._profiler_view)
+            filename = '%s-%dms-%d-%d.prof' % (view_name, elapsed, int(time.time()), os.getpid())
+            profiler.dump_stats(os.path.join(self.path, filename))
+        return response
@@ -16,6 +16,11 @@ __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
 import json
+from django.db import models
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.redirects.models import Redirect
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
         
@@ -26,3 +31,83 @@ def validate_json(value):
         json.loads(value)
     except:
         raise ValidationError(_('Ivalid JSON syntax'))
+
+class ReportJob(models.Model):
+    """A request of (background) generation of a registered report.
+    """
+    STATUS_CHOICES = (
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('done', _('Done')),
+        ('failed', _('Failed')),
+    )
+
+    report = models.CharField(max_length=100, verbose_name=_('report'))
+    params = models.TextField(blank=True, default='{}', validators=[validate_json], verbose_name=_('parameters'))
+    cache_key = models.CharField(max_length=40, db_index=True, verbose_name=_('cache key'))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name=_('status'))
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name=_('progress'))
+    result = models.CharField(max_length=255, blank=True, verbose_name=_('result'))
+    error = models.TextField(blank=True, verbose_name=_('error'))
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, verbose_name=_('user'))
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_('created on'))
+    updated = models.DateTimeField(auto_now=True, verbose_name=_('updated on'))
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = _('report job')
+        verbose_name_plural = _('report jobs')
+
+    def __unicode__(self):
+        return u'%s #%s' % (self.report, self.pk)
+
+    @models.permalink
+    def get_absolute_url(self):
+        return ('report_job_status', (), {'pk': self.pk})
+
+    def get_params(self):
+        return json.loads(self.params or '{}')
+
+    @property
+    def result_url(self):
+        if self.status != 'done' or not self.result:
+            return None
+        return settings.MEDIA_URL + self.result
+
+
+class SearchIndexEntry(models.Model):
+    """A posting of the global search inverted index: a term found in an object.
+    """
+    term = models.CharField(max_length=50, db_index=True, verbose_name=_('term'))
+    content_type = models.ForeignKey(ContentType, verbose_name=_('content type'))
+    object_id = models.PositiveIntegerField(verbose_name=_('object id'))
+    weight = models.PositiveIntegerField(default=1, verbose_name=_('weight'))
+
+    class Meta:
+        index_together = (('content_type', 'object_id'),)
+        verbose_name = _('search index entry')
+        verbose_name_plural = _('search index entries')
+
+    def __unicode__(self):
+        return u'%s (%s #%s)' % (self.term, self.content_type, self.object_id)
+
+## SIGNALS ##
+
+def invalidate_redirects(sender, **kwargs):
+    """Makes every process reload the in-memory redirect tables.
+
+    It's connected here (and not in the middleware module) so changes made
+    outside of the web processes, i.e. by management commands, are seen too.
+    """
+    from middleware import redirect_table
+    redirect_table.invalidate()
+
+post_save.connect(invalidate_redirects, sender=Redirect, dispatch_uid="invalidate_redirects_on_save")
+post_delete.connect(invalidate_redirects, sender=Redirect, dispatch_uid="invalidate_redirects_on_delete")
+
+## SEARCH ##
+
+# Registrations are discovered here, so every process (not only the web ones)
+# keeps the search index up to date.
+from search import autodiscover as search_autodiscover
+search_autodiscover()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+import json
+import hashlib
+import datetime
+import traceback
+from uuid import uuid4
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.db.models import Max, Count
+from django.template import Context
+from django.template.loader import get_template
+from django.utils import timezone, translation
+
+from models import ReportJob
+from utils.pagination import paginate_by_keyset
+
+class Report(object):
+    """A report rendered from a template, over the objects of a queryset.
+
+    queryset_func is called with the report parameters as keyword arguments
+    and must return the queryset to report. The template is rendered once per
+    chunk of objects with the following context variables: "report",
+    "params", "objects", "total", "first_chunk" and "last_chunk" (so it can
+    output its header and footer only once).
+
+    If version_field is given (i.e. a modification timestamp), the generated
+    reports are reused until the reported data changes. If permission is given
+    (i.e. "auth.change_user"), only the users who have it can request it.
+    """
+    def __init__(self, name, template_name, queryset_func, ordering=('pk',), version_field=None, extension='html', chunk_size=500, permission=None):
+        self.name = name
+        self.template_name = template_name
+        self.queryset_func = queryset_func
+        self.ordering = ordering
+        self.version_field = version_field
+        self.extension = extension
+        self.chunk_size = chunk_size
+        self.permission = permission
+
+    def has_permission(self, user):
+        if not user.is_authenticated():
+            return False
+        return not self.permission or user.has_perm(self.permission)
+
+    def get_queryset(self, params):
+        return self.queryset_func(**dict([(str(k), v) for k, v in params.items()]))
+
+    def get_version(self, params):
+        """Returns a token which changes when the reported data changes.
+        """
+        if not self.version_field:
+            return ''
+        values = self.get_queryset(params).aggregate(last=Max(self.version_field), count=Count('pk'))
+        return u'%s:%s' % (values['last'], values['count'])
+
+    def get_cache_key(self, params):
+        data = json.dumps([self.name, params, self.get_version(params)], sort_keys=True)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def render(self, params, fileobj, progress=None):
+        """Renders the report in fileobj, chunk by chunk.
+
+        progress, if given, is called with the number of rendered objects and
+        the total after each chunk.
+        """
+        template = get_template(self.template_name)
+        queryset = self.get_queryset(params)
+        total = queryset.count()
+        done = 0
+        cursor = None
+        first = True
+
+        while True:
+            page = paginate_by_keyset(queryset, self.ordering, self.chunk_size, cursor)
+            last = not page.has_next()
+            context = Context({
+                'report': self,
+                'params': params,
+                'objects': page.object_list,
+                'total': total,
+                'first_chunk': first,
+                'last_chunk': last,
+            })
+            fileobj.write(template.render(context).encode('utf-8'))
+            done += len(page)
+            if progress:
+                progress(done, total)
+            if last:
+                break
+            cursor = page.next_cursor
+            first = False
+
+_registry = {}
+
+def register(name, template_name, queryset_func, **kwargs):
+    """Registers a new report. See Report for the accepted arguments.
+    """
+    _registry[name] = Report(name, template_name, queryset_func, **kwargs)
+    return _registry[name]
+
+def get_report(name):
+    """Returns the registered report with the given name.
+
+    Reports of installed applications are discovered on first use, so they
+    are available in every process (not only in "processreports").
+    """
+    if name not in _registry:
+        autodiscover()
+    return _registry[name]
+
+def submit_report(name, params=None, user=None):
+    """Returns the ReportJob which generates the given report for user.
+
+    A job of the same user for the same report, parameters and data version is
+    reused if still pending, running or already done (and its file still
+    exists). If user is given but not allowed to request the report,
+    PermissionDenied is raised; user=None is meant for internal jobs (i.e.
+    requested by management commands) only.
+    """
+    params = params or {}
+    report = get_report(name)
+    if user is not None and not report.has_permission(user):
+        raise PermissionDenied
+    cache_key = report.get_cache_key(params)
+
+    for job in ReportJob.objects.filter(cache_key=cache_key, user=user).exclude(status='failed').order_by('-created'):
+        if job.status != 'done' or os.path.exists(os.path.join(settings.MEDIA_ROOT, job.result)):
+            return job
+
+    return ReportJob.objects.create(report=name, params=json.dumps(params), cache_key=cache_key, user=user)
+
+def process_job(job):
+    """Generates the report of the given job (if not claimed by others yet).
+
+    The file is written in MEDIA_ROOT/reports/ and the job progress is
+    updated after every chunk, so it can be polled meanwhile. Its name ends
+    with a random token, so it can't be guessed from the report parameters.
+    """
+    if not ReportJob.objects.filter(pk=job.pk, status='pending').update(status='running', updated=timezone.now()):
+        return False
+
+    try:
+        report = get_report(job.report)
+        params = job.get_params()
+        result = 'reports/%s-%s.%s' % (job.cache_key, uuid4().hex, report.extension)
+        path = os.path.join(settings.MEDIA_ROOT, result)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        def progress(done, total):
+            ReportJob.objects.filter(pk=job.pk).update(progress=(done * 100 // total) if total else 100, updated=timezone.now())
+
+        tmp_path = path + '.tmp'
+
+        translation.activate(params.get('language', settings.LANGUAGE_CODE))
+        try:
+            with open(tmp_path, 'wb') as fileobj:
+                report.render(params, fileobj, progress)
+            os.rename(tmp_path, path)
+        finally:
+            translation.deactivate()
+
+        ReportJob.objects.filter(pk=job.pk).update(status='done', progress=100, result=result, updated=timezone.now())
+
+    except Exception:
+        ReportJob.objects.filter(pk=job.pk).update(status='failed', error=traceback.format_exc(), updated=timezone.now())
+
+    return True
+
+def _process_job_in_thread(job):
+    try:
+        return process_job(job)
+    finally:
+        connection.close()
+
+def reset_stale_jobs(timeout=None):
+    """Puts back in the queue the running jobs not updated for timeout seconds.
+
+    They were most likely claimed by a worker which died in the meantime. The
+    default timeout is REPORT_JOB_TIMEOUT (one hour if not set). Returns the
+    number of reset jobs.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'REPORT_JOB_TIMEOUT', 3600)
+    threshold = timezone.now() - datetime.timedelta(seconds=timeout)
+    return ReportJob.objects.filter(status='running', updated__lt=threshold).update(status='pending', progress=0, updated=timezone.now())
+
+def process_pending_jobs(limit=None, workers=1):
+    """Processes the pending jobs (up to limit), using a pool of workers.
+
+    Stale running jobs are reset first (see reset_stale_jobs). Returns the
+    number of processed jobs.
+    """
+    reset_stale_jobs()
+    jobs = ReportJob.objects.filter(status='pending')
+    if limit:
+        jobs = jobs[:limit]
+    jobs = list(jobs)
+
+    if workers > 1 and len(jobs) > 1:
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(_process_job_in_thread, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [process_job(job) for job in jobs]
+
+    return len([r for r in results if r])
+
+# Application specific reports discovering.
+LOADING = False
+
+def autodiscover():
+    """Auto discover reports of installed applications.
+    """
+    global LOADING
+    if LOADING:
+        return
+
+    LOADING = True
+
+    import imp
+
+    for app in settings.INSTALLED_APPS:
+        if app.startswith('django.') or app == "djangoerp.core":
+            continue
+
+        try:
+            app_path = __import__(app, {}, {}, [app.split('.')[-1]]).__path__
+        except AttributeError:
+            continue
+
+        try:
+            imp.find_module('reports', app_path)
+        except ImportError:
+            continue
+
+        __import__('%s.reports' % app)
+
+    LOADING = False
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import random
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+PRIMARY_DB_ALIAS = 'default'
+
+_state = threading.local()
+
+def pin_to_primary(pinned=True):
+    """Routes (or stops routing) all the reads of the current thread to the
+    primary database.
+    """
+    _state.pinned = pinned
+
+def is_pinned_to_primary():
+    return getattr(_state, 'pinned', False)
+
+@contextmanager
+def use_primary():
+    """Context manager to read from the primary database.
+
+    Example usage:
+
+    with use_primary():
+        invoice = Invoice.objects.get(pk=pk)
+    """
+    pinned = is_pinned_to_primary()
+    pin_to_primary()
+    try:
+        yield
+    finally:
+        pin_to_primary(pinned)
+
+def get_replica(replicas=None):
+    """Returns a replica alias, randomly chosen according to its weight.
+
+    replicas is a dictionary of alias/weight pairs (DATABASE_REPLICAS by
+    default). If no replica is available, PRIMARY_DB_ALIAS is returned.
+    """
+    if replicas is None:
+        replicas = getattr(settings, 'DATABASE_REPLICAS', {})
+    total = sum(replicas.values())
+    if total <= 0:
+        return PRIMARY_DB_ALIAS
+    point = random.uniform(0, total)
+    for alias, weight in sorted(replicas.items()):
+        point -= weight
+        if point <= 0 and weight > 0:
+            return alias
+    return alias
+
+class ReplicaRouter(object):
+    """Routes reads to the replicas in DATABASE_REPLICAS and writes to the
+    primary database.
+
+    DATABASE_REPLICAS is a dictionary of alias/weight pairs; each alias must
+    be defined in DATABASES too. Reads go to the primary database while the
+    thread is pinned (see ReplicaPinningMiddleware and use_primary).
+    """
+    def db_for_read(self, model, **hints):
+        if is_pinned_to_primary():
+            return PRIMARY_DB_ALIAS
+        return get_replica()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = set(getattr(settings, 'DATABASE_REPLICAS', {}).keys())
+        aliases.add(PRIMARY_DB_ALIAS)
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_syncdb(self, db, model):
+        if db in getattr(settings, 'DATABASE_REPLICAS', {}):
+            return False
+        return None
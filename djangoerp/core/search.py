@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import re
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router
+from django.db.models.signals import post_save, post_delete
+from django.utils.datastructures import SortedDict
+from django.utils.encoding import force_text
+
+from models import SearchIndexEntry
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 50
+MAX_QUERY_TERMS = 10
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+_registry = {}
+
+def tokenize(text):
+    """Returns the (lowercase) indexable terms of the given text.
+    """
+    terms = []
+    for term in _TERM_RE.findall(force_text(text or '').lower()):
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append(term[:MAX_TERM_LENGTH])
+    return terms
+
+def register(model, fields, weights=None):
+    """Adds the given fields of model to the global search index.
+
+    weights is an optional dictionary of field/weight pairs (1 by default),
+    to rank the matches in some fields (i.e. names) above the others. The
+    index is updated when objects are saved or deleted; after bulk changes
+    (i.e. bulk_create or update) use the "rebuildsearchindex" command.
+    """
+    _registry[model] = (tuple(fields), weights or {})
+    post_save.connect(index_object, sender=model, dispatch_uid="search_index_%s" % model._meta)
+    post_delete.connect(unindex_object, sender=model, dispatch_uid="search_unindex_%s" % model._meta)
+
+def get_registered_models():
+    return list(_registry.keys())
+
+def _get_entries(obj, content_type):
+    fields, weights = _registry[obj.__class__]
+    terms = {}
+    for field in fields:
+        weight = weights.get(field, 1)
+        for term in tokenize(getattr(obj, field, None)):
+            terms[term] = terms.get(term, 0) + weight
+    return [SearchIndexEntry(term=term, content_type=content_type, object_id=obj.pk, weight=weight) for term, weight in terms.items()]
+
+def index_object(sender=None, instance=None, **kwargs):
+    """Updates the index entries of the given object.
+
+    It runs in the transaction of the caller (i.e. the one saving instance).
+    """
+    content_type = ContentType.objects.get_for_model(instance)
+    SearchIndexEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+    SearchIndexEntry.objects.bulk_create(_get_entries(instance, content_type))
+
+def unindex_object(sender=None, instance=None, **kwargs):
+    """Removes the given object from the index.
+    """
+    content_type = ContentType.objects.get_for_model(instance)
+    SearchIndexEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+def rebuild_index(model, batch_size=500, progress=None):
+    """Rebuilds the index entries of all the objects of the given model.
+
+    Objects are read by primary key ranges and indexed with a bulk insert per
+    batch, in the transaction of the caller. progress, if given, is called
+    with the number of indexed objects.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    SearchIndexEntry.objects.filter(content_type=content_type).delete()
+    queryset = model._default_manager.order_by('pk')
+    last_pk = None
+    done = 0
+
+    while True:
+        batch = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        entries = []
+        for obj in batch:
+            entries.extend(_get_entries(obj, content_type))
+        SearchIndexEntry.objects.bulk_create(entries)
+        last_pk = batch[-1].pk
+        done += len(batch)
+        if progress:
+            progress(done)
+
+    return done
+
+def _prefix_range(prefix):
+    """Returns the [lower, upper) range of the terms starting with prefix.
+
+    Unlike LIKE, range comparisons can use the term index on every backend.
+    """
+    return prefix, prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+
+def _rank_matches(terms, content_type_ids, limit):
+    """Returns the (content type id, object id) pairs matching all the terms.
+
+    The last term also matches as prefix. Intersection, ranking (by the sum
+    of the weights of the matched postings) and limit are all done by the
+    database, with a single grouped query over the matching postings.
+    """
+    opts = SearchIndexEntry._meta
+    connection = connections[router.db_for_read(SearchIndexEntry)]
+    qn = connection.ops.quote_name
+    term, content_type, object_id, weight = [qn(opts.get_field(name).column) for name in ('term', 'content_type', 'object_id', 'weight')]
+
+    conditions = [('%s = %%s' % term, [t]) for t in sorted(set(terms[:-1]))]
+    conditions.append(('(%s >= %%s AND %s < %%s)' % (term, term), list(_prefix_range(terms[-1]))))
+
+    sql = 'SELECT %(ct)s, %(obj)s, SUM(%(weight)s) AS score FROM %(table)s' \
+        ' WHERE %(ct)s IN (%(ct_ids)s) AND (%(where)s)' \
+        ' GROUP BY %(ct)s, %(obj)s HAVING %(having)s' \
+        ' ORDER BY score DESC LIMIT %%s' % {
+            'ct': content_type,
+            'obj': object_id,
+            'weight': weight,
+            'table': qn(opts.db_table),
+            'ct_ids': ', '.join(['%s'] * len(content_type_ids)),
+            'where': ' OR '.join([c for c, p in conditions]),
+            'having': ' AND '.join(['MAX(CASE WHEN %s THEN 1 ELSE 0 END) = 1' % c for c, p in conditions]),
+        }
+    params = list(content_type_ids)
+    for c, p in conditions:
+        params.extend(p)
+    for c, p in conditions:
+        params.extend(p)
+    params.append(limit)
+
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+def search(query, user, limit=50):
+    """Returns the objects matching all the terms of query, grouped by model.
+
+    Every term must match on its own, the last one also as prefix. The result
+    is a list of (model, [objects]) pairs, both sorted by relevance. Only the
+    models the user can change are searched: without user, nothing is found.
+    """
+    if user is None:
+        return []
+
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    models = [m for m in get_registered_models() if user.has_perm('%s.change_%s' % (m._meta.app_label, m._meta.object_name.lower()))]
+    if not models:
+        return []
+
+    content_types = ContentType.objects.get_for_models(*models)
+    content_type_ids = [ct.pk for ct in content_types.values()]
+
+    ranked = SortedDict()
+    for content_type_id, object_id in _rank_matches(terms, content_type_ids, limit):
+        ranked.setdefault(content_type_id, []).append(object_id)
+
+    models_by_id = dict([(ct.pk, model) for model, ct in content_types.items()])
+    results = []
+    for content_type_id, ids in ranked.items():
+        model = models_by_id[content_type_id]
+        objects = model._default_manager.in_bulk(ids)
+        results.append((model, [objects[i] for i in ids if i in objects]))
+
+    return results
+
+# Application specific search registrations discovering.
+LOADING = False
+
+def autodiscover():
+    """Auto discover search registrations of installed applications.
+
+    It's called when the core models are loaded, so objects saved by
+    management commands and shells are indexed too.
+    """
+    global LOADING
+    if LOADING:
+        return
+
+    LOADING = True
+
+    import imp
+
+    for app in settings.INSTALLED_APPS:
+        if app.startswith('django.') or app == "djangoerp.core":
+            continue
+
+        try:
+            app_path = __import__(app, {}, {}, [app.split('.')[-1]]).__path__
+        except AttributeError:
+            continue
+
+        try:
+            imp.find_module('search', app_path)
+        except ImportError:
+            continue
+
+        __import__('%s.search' % app)
+
+    LOADING = False
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+KEY_PREFIX = "djangoerp.core.sessions"
+SYNC_KEY_PREFIX = "djangoerp.core.sessions.synced"
+
+class SessionStore(DBStore):
+    """Cache-first session engine which coalesces expiry refreshes.
+
+    Sessions are read from the cache set by SESSION_CACHE_ALIAS and fall back
+    to the database on misses. Session data is still loaded lazily, on first
+    access. The cache must be shared by all the processes (i.e. memcached):
+    with a per-process cache, other processes would read stale sessions.
+
+    Saves of new, cycled or modified sessions always write through to the
+    database, so losing the cache never loses data. Saves which only refresh
+    the expiry (i.e. with SESSION_SAVE_EVERY_REQUEST) update the cache, but
+    the database row at most once every SESSION_WRITE_BEHIND_INTERVAL seconds
+    per session: its expiry date may lag behind by up to that interval.
+
+    Usage: SESSION_ENGINE = 'djangoerp.core.sessions'
+    """
+    def __init__(self, session_key=None):
+        self._cache = get_cache(settings.SESSION_CACHE_ALIAS)
+        super(SessionStore, self).__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return KEY_PREFIX + self._get_or_create_session_key()
+
+    @property
+    def sync_key(self):
+        return SYNC_KEY_PREFIX + self._get_or_create_session_key()
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key, None)
+        except Exception:
+            # Some backends (e.g. memcache) raise an exception on invalid
+            # cache keys. If this happens, reset the session.
+            data = None
+        if data is None:
+            data = super(SessionStore, self).load()
+            if self.session_key is not None:
+                self._cache.set(self.cache_key, data, self.get_expiry_age())
+        return data
+
+    def exists(self, session_key):
+        if (KEY_PREFIX + session_key) in self._cache:
+            return True
+        return super(SessionStore, self).exists(session_key)
+
+    def save(self, must_create=False):
+        interval = getattr(settings, 'SESSION_WRITE_BEHIND_INTERVAL', 60)
+        if must_create or self.modified or self.session_key is None or not self._cache.get(self.sync_key):
+            super(SessionStore, self).save(must_create)
+            if interval:
+                self._cache.set(self.sync_key, True, interval)
+        self._cache.set(self.cache_key, self._get_session(no_load=must_create), self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        super(SessionStore, self).delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete_many([KEY_PREFIX + session_key, SYNC_KEY_PREFIX + session_key])
+
+    def flush(self):
+        """Removes the current session data from the database and regenerates
+        the key.
+        """
+        self.clear()
+        self.delete(self.session_key)
+        self.create()
@@ -15,6 +15,9 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
+from django.template import Node, Variable
+from django.template.context import BaseContext
+
 def parse_args_kwargs(parser, token):
     contents = token.split_contents()
     tag_name = contents[0]
@@ -30,3 +33,116 @@ def parse_args_kwargs(parser, token):
             args.append(value)
     
     return tag_name, args, kwargs
+
+_MISSING = object()
+
+def _lookup(current, bit):
+    """Returns current[bit], current.bit or current[int(bit)], or _MISSING.
+
+    Lookups are tried in the same order as Variable does, but dictionaries
+    (and contexts) are checked for the key and indexes are only tried for
+    numeric bits, so misses don't raise exceptions.
+    """
+    if isinstance(current, (dict, BaseContext)):
+        if bit in current:
+            return current[bit]
+    elif hasattr(current, '__getitem__') and not isinstance(current, (list, tuple, basestring)):
+        # Custom containers (i.e. forms) can only tell by trying.
+        try:
+            return current[bit]
+        except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+            pass
+    value = getattr(current, bit, _MISSING)
+    if value is not _MISSING or not bit.isdigit():
+        return value
+    try:
+        return current[int(bit)]
+    except (TypeError, AttributeError, KeyError, IndexError):
+        return _MISSING
+
+class CompiledArgument(object):
+    """A tag argument compiled once, at parse time.
+
+    Arguments are parsed into FilterExpressions (so filters are supported)
+    and constants without filters are resolved in advance. Plain variables
+    are resolved by walking the context directly, which (unlike Variable)
+    doesn't raise and catch an exception for each missing value. Missing
+    variables, and exceptions with "silent_variable_failure" set (i.e.
+    ObjectDoesNotExist), are resolved as None.
+    """
+    def __init__(self, parser, token):
+        self.expression = parser.compile_filter(token)
+        var = self.expression.var
+        self.lookups = None
+        self.is_constant = False
+        if not self.expression.filters and isinstance(var, Variable) and not var.translate:
+            if var.lookups is None:
+                self.is_constant = True
+                self.value = var.literal
+            else:
+                self.lookups = var.lookups
+
+    def _resolve_lookups(self, context):
+        try:
+            return self._walk_lookups(context)
+        except Exception as e:
+            if getattr(e, 'silent_variable_failure', False):
+                return None
+            raise
+
+    def _walk_lookups(self, context):
+        current = context
+        for bit in self.lookups:
+            current = _lookup(current, bit)
+            if current is _MISSING:
+                return None
+            if callable(current):
+                if getattr(current, 'do_not_call_in_templates', False):
+                    pass
+                elif getattr(current, 'alters_data', False):
+                    return None
+                else:
+                    try:
+                        current = current()
+                    except TypeError:
+                        return None
+        return current
+
+    def resolve(self, context):
+        if self.is_constant:
+            return self.value
+        if self.lookups is not None:
+            return self._resolve_lookups(context)
+        return self.expression.resolve(context, ignore_failures=True)
+
+def compile_args_kwargs(parser, token):
+    """Like parse_args_kwargs, but compiles args and kwargs as CompiledArguments.
+    """
+    tag_name, args, kwargs = parse_args_kwargs(parser, token)
+    args = [CompiledArgument(parser, arg) for arg in args]
+    kwargs = dict([(k, CompiledArgument(parser, arg)) for k, arg in kwargs.items()])
+    return tag_name, args, kwargs
+
+class CompiledNode(Node):
+    """Base node for tags with compiled arguments.
+
+    Subclasses should implement render_with_args(context, *args, **kwargs).
+
+    Example usage:
+
+    @register.tag
+    def my_tag(parser, token):
+        tag_name, args, kwargs = compile_args_kwargs(parser, token)
+        return MyTagNode(args, kwargs)
+    """
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def render_with_args(self, context, *args, **kwargs):
+        raise NotImplementedError
+
+    def render(self, context):
+        args = [arg.resolve(context) for arg in self.args]
+        kwargs = dict([(k, arg.resolve(context)) for k, arg in self.kwargs.items()])
+        return self.render_with_args(context, *args, **kwargs)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+from django import template
+
+from djangoerp.core.search import search
+
+register = template.Library()
+
+@register.inclusion_tag('elements/search_box.html', takes_context=True)
+def render_search_box(context):
+    """
+    Renders the global search box.
+
+    Example tag usage: {% render_search_box %}
+    """
+    try:
+        query = context['request'].GET.get('q', '')
+    except (KeyError, AttributeError):
+        query = ''
+    return {'query': query}
+
+@register.assignment_tag(takes_context=True)
+def search_results(context, query, limit=50):
+    """
+    Returns the global search results for query, grouped by model.
+
+    Without a request user, nothing is found.
+
+    Example tag usage: {% search_results query as results %}
+    """
+    try:
+        user = context['request'].user
+    except (KeyError, AttributeError):
+        return []
+    return search(query, user, limit)
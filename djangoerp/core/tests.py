@@ -15,14 +15,45 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
-from django.test import TestCase
+import os
+from django.test import TestCase, TransactionTestCase
+from django.test.client import RequestFactory
+from django.http import HttpResponse, HttpResponseNotFound, Http404
+from django.core.management import call_command
+from django.db.models.signals import post_save, post_delete
 from django.utils.safestring import mark_safe
+from django.template import Template, Context
 from django.template.loader import render_to_string
+from django.views.generic import View
+from django.forms import ModelForm
 
+from forms import *
 from models import *
+from middleware import *
+from routers import *
 from utils import *
 from utils.dependencies import *
 from utils.rendering import *
+from utils.pagination import *
+from views import *
+
+class _ConditionalView(ConditionalGetMixin, View):
+    last_modified_field = 'last_login'
+    renders = 0
+
+    def get_queryset(self):
+        from django.contrib.auth.models import User
+        return User.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        _ConditionalView.renders += 1
+        return HttpResponse("rendered")
+
+class _ReportJobImportForm(ModelForm):
+    # Defined at module level so it can be pickled to worker processes.
+    class Meta:
+        model = ReportJob
+        fields = ('report', 'cache_key')
 
 class _FakeRequest(object):
     def __init__(self):
@@ -129,3 +160,761 @@ class RenderingFieldToValueCase(TestCase):
 
 class RenderingFieldToStringCase(TestCase):
     pass
+
+class KeysetPaginationCase(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        for name in ("u1", "u2", "u3", "u4", "u5"):
+            User.objects.create(username=name)
+        self.queryset = User.objects.all()
+
+    def test_cursor_round_trip(self):
+        """Tests that a cursor returns the values it was encoded with.
+        """
+        self.assertEqual(decode_cursor(encode_cursor(["a", "1"], True)), (["a", "1"], True))
+
+    def test_tampered_cursor(self):
+        """Tests that a tampered cursor is ignored.
+        """
+        self.assertEqual(decode_cursor(encode_cursor(["a"]) + "x"), (None, False))
+
+    def test_forward_and_backward_pages(self):
+        """Tests moving forward and backward through keyset pages.
+        """
+        page1 = paginate_by_keyset(self.queryset, ('username',), 2)
+        self.assertEqual([u.username for u in page1], ["u1", "u2"])
+        self.assertFalse(page1.has_previous())
+        self.assertTrue(page1.has_next())
+
+        page2 = paginate_by_keyset(self.queryset, ('username',), 2, page1.next_cursor)
+        self.assertEqual([u.username for u in page2], ["u3", "u4"])
+
+        page3 = paginate_by_keyset(self.queryset, ('username',), 2, page2.next_cursor)
+        self.assertEqual([u.username for u in page3], ["u5"])
+        self.assertFalse(page3.has_next())
+
+        back = paginate_by_keyset(self.queryset, ('username',), 2, page2.previous_cursor)
+        self.assertEqual([u.username for u in back], ["u1", "u2"])
+        self.assertFalse(back.has_previous())
+        self.assertEqual(back.count, 5)
+
+    def test_estimated_count_below_threshold(self):
+        """Tests that small lists are counted exactly even if estimated.
+        """
+        page = paginate_by_keyset(self.queryset, ('username',), 2, estimate_count=True)
+        self.assertEqual(page.count, 5)
+
+    def test_related_ordering(self):
+        """Tests that related orderings are rejected.
+        """
+        from django.core.exceptions import ImproperlyConfigured
+        self.assertRaises(ImproperlyConfigured, paginate_by_keyset, self.queryset, ('groups__name',), 2)
+
+class RedirectFallbackCase(TestCase):
+    def setUp(self):
+        from django.contrib.sites.models import Site
+        self.site = Site.objects.get_current()
+        Redirect.objects.create(site=self.site, old_path="/old/", new_path="/new/")
+        Redirect.objects.create(site=self.site, old_path="/gone/", new_path="")
+        self.middleware = RedirectFallbackMiddleware()
+        self.factory = RequestFactory()
+
+    def test_redirect(self):
+        """Tests that a 404 on a known old path is redirected.
+        """
+        response = self.middleware.process_response(self.factory.get("/old/"), HttpResponseNotFound())
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], "/new/")
+
+    def test_gone(self):
+        """Tests that a 404 on a removed path becomes a 410.
+        """
+        response = self.middleware.process_response(self.factory.get("/gone/"), HttpResponseNotFound())
+        self.assertEqual(response.status_code, 410)
+
+    def test_miss_without_queries(self):
+        """Tests that, once loaded, unknown paths don't hit the database.
+        """
+        self.middleware.process_response(self.factory.get("/old/"), HttpResponseNotFound())
+        with self.assertNumQueries(0):
+            response = self.middleware.process_response(self.factory.get("/missing/"), HttpResponseNotFound())
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalidation_on_save(self):
+        """Tests that saving a redirect updates the table.
+        """
+        self.middleware.process_response(self.factory.get("/old/"), HttpResponseNotFound())
+        Redirect.objects.create(site=self.site, old_path="/added/", new_path="/new/")
+        response = self.middleware.process_response(self.factory.get("/added/"), HttpResponseNotFound())
+        self.assertEqual(response.status_code, 301)
+
+class WriteBehindSessionCase(TestCase):
+    def test_modified_writes_through(self):
+        """Tests that saving a modified session always writes the DB.
+        """
+        from django.contrib.sessions.models import Session
+        from sessions import SessionStore
+        store = SessionStore()
+        store['foo'] = 1
+        store.save()
+        store['foo'] = 2
+        store.save()
+        self.assertEqual(Session.objects.get(session_key=store.session_key).get_decoded()['foo'], 2)
+
+    def test_coalesced_refreshes(self):
+        """Tests that unmodified saves within the interval skip the DB.
+        """
+        from sessions import SessionStore
+        store = SessionStore()
+        store['foo'] = 1
+        store.save()
+        store = SessionStore(store.session_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(store['foo'], 1)
+            store.save()
+
+    def test_cycle_key(self):
+        """Tests that a cycled session is written through under the new key.
+        """
+        from django.contrib.sessions.models import Session
+        from sessions import SessionStore
+        store = SessionStore()
+        store['foo'] = 1
+        store.save()
+        old_key = store.session_key
+        store.cycle_key()
+        store.save()
+        self.assertFalse(Session.objects.filter(session_key=old_key).exists())
+        self.assertEqual(Session.objects.get(session_key=store.session_key).get_decoded()['foo'], 1)
+
+    def test_delete(self):
+        """Tests that a deleted session is removed from cache and DB.
+        """
+        from sessions import SessionStore
+        store = SessionStore()
+        store['foo'] = 1
+        store.save()
+        store.delete()
+        self.assertFalse(store.exists(store.session_key))
+
+class PurgeSessionsCase(TestCase):
+    def test_purge_expired_sessions(self):
+        """Tests that only expired sessions are purged.
+        """
+        import datetime
+        from django.utils import timezone
+        from django.contrib.sessions.models import Session
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key="expired%d" % i, session_data="", expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key="alive", session_data="", expire_date=now + datetime.timedelta(days=1))
+        call_command("purgesessions", batch_size=2, verbosity=0)
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["alive"])
+
+class ReportJobCase(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        from reports import register
+        for name in ("u1", "u2", "u3"):
+            User.objects.create(username=name)
+        register("test_users", "elements/empty.html", lambda **params: User.objects.all(), version_field="last_login", chunk_size=2)
+        self.media_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.media_root)
+
+    def test_process_report_job(self):
+        """Tests that a submitted job is generated, chunk by chunk, and reused.
+        """
+        from django.test.utils import override_settings
+        from reports import submit_report, process_pending_jobs
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job = submit_report("test_users", {"foo": 1})
+            self.assertEqual(job.status, "pending")
+            self.assertEqual(process_pending_jobs(), 1)
+            job = ReportJob.objects.get(pk=job.pk)
+            self.assertEqual(job.status, "done")
+            self.assertEqual(job.progress, 100)
+            with open(os.path.join(self.media_root, job.result)) as f:
+                self.assertEqual(f.read().count("Empty"), 2)
+            self.assertEqual(submit_report("test_users", {"foo": 1}).pk, job.pk)
+            self.assertNotEqual(submit_report("test_users", {"foo": 2}).pk, job.pk)
+
+    def test_unguessable_result(self):
+        """Tests that result files of equal reports have different names.
+        """
+        from django.contrib.auth.models import User
+        from django.test.utils import override_settings
+        from reports import submit_report, process_pending_jobs
+        with override_settings(MEDIA_ROOT=self.media_root):
+            job1 = submit_report("test_users", user=User.objects.get(username="u1"))
+            job2 = submit_report("test_users", user=User.objects.get(username="u2"))
+            process_pending_jobs()
+            job1, job2 = ReportJob.objects.get(pk=job1.pk), ReportJob.objects.get(pk=job2.pk)
+            self.assertEqual(job1.cache_key, job2.cache_key)
+            self.assertNotEqual(job1.result, job2.result)
+            self.assertFalse(job1.cache_key + "." in job1.result)
+
+    def test_jobs_per_user(self):
+        """Tests that jobs are not shared between users nor seen by others.
+        """
+        from django.contrib.auth.models import User, AnonymousUser
+        from reports import submit_report
+        u1, u2 = User.objects.get(username="u1"), User.objects.get(username="u2")
+        job = submit_report("test_users", user=u1)
+        self.assertNotEqual(submit_report("test_users", user=u2).pk, job.pk)
+        internal_job = submit_report("test_users")
+        for user, j in ((u2, job), (AnonymousUser(), job), (AnonymousUser(), internal_job)):
+            request = RequestFactory().get("/")
+            request.user = user
+            self.assertRaises(Http404, ReportJobStatusView.as_view(), request, pk=j.pk)
+        request = RequestFactory().get("/")
+        request.user = u1
+        self.assertEqual(ReportJobStatusView.as_view()(request, pk=job.pk).status_code, 200)
+
+    def test_report_permission(self):
+        """Tests that reports with a permission can't be requested without it.
+        """
+        from django.contrib.auth.models import User
+        from django.core.exceptions import PermissionDenied
+        from reports import register, submit_report
+        register("test_perm_users", "elements/empty.html", lambda **params: User.objects.all(), permission="auth.change_user")
+        self.assertRaises(PermissionDenied, submit_report, "test_perm_users", user=User.objects.get(username="u1"))
+
+    def test_reset_stale_jobs(self):
+        """Tests that jobs left running by dead workers are queued again.
+        """
+        import datetime
+        from django.utils import timezone
+        from reports import submit_report, reset_stale_jobs
+        job = submit_report("test_users")
+        ReportJob.objects.filter(pk=job.pk).update(status="running", updated=timezone.now() - datetime.timedelta(hours=2))
+        self.assertEqual(reset_stale_jobs(60), 1)
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, "pending")
+        self.assertEqual(reset_stale_jobs(60), 0)
+
+class AddCrumbTagCase(TestCase):
+    def _render_crumbs(self, template, **context):
+        request = _FakeRequest()
+        context['request'] = request
+        Template("{% load breadcrumbs %}" + template).render(Context(context))
+        return request.breadcrumbs
+
+    def test_constant_crumb(self):
+        """Tests adding a crumb with a constant name and URL.
+        """
+        self.assertEqual(self._render_crumbs("{% add_crumb 'Home' '/' %}"), [(u'Home', '/')])
+
+    def test_filtered_crumb(self):
+        """Tests that filters are applied to crumb arguments.
+        """
+        self.assertEqual(self._render_crumbs("{% add_crumb name|upper %}", name="home"), [(u'HOME', None)])
+
+    def test_missing_variable_crumb(self):
+        """Tests that missing variables are resolved as None.
+        """
+        self.assertEqual(self._render_crumbs("{% add_crumb 'Home' url %}"), [(u'Home', None)])
+
+    def test_nested_variable_crumb(self):
+        """Tests that nested lookups walk dicts, attributes and indexes.
+        """
+        crumbs = self._render_crumbs("{% add_crumb page.names.0 page.missing.url %}", page={'names': ['Home']})
+        self.assertEqual(crumbs, [(u'Home', None)])
+
+    def test_silent_failure_crumb(self):
+        """Tests that silent variable failures are resolved as None.
+        """
+        from django.core.exceptions import ObjectDoesNotExist
+        class _Obj(object):
+            @property
+            def profile(self):
+                raise ObjectDoesNotExist
+        self.assertEqual(self._render_crumbs("{% add_crumb 'Home' obj.profile.url %}", obj=_Obj()), [(u'Home', None)])
+
+class ERPModelAdminCase(TestCase):
+    def setUp(self):
+        from django.contrib import admin
+        from django.contrib.auth.models import User
+        from admin import ModelAdmin
+        class UserAdmin(ModelAdmin):
+            list_display = ('username', 'is_staff', 'full_name')
+            def full_name(self, obj):
+                return obj.get_full_name()
+        self.model_admin = UserAdmin(User, admin.site)
+        self.request = RequestFactory().get("/admin/auth/user/")
+
+    def test_rendered_columns(self):
+        """Tests that model fields are rendered through field_to_string.
+        """
+        from django.contrib.auth.models import User
+        list_display = self.model_admin.get_list_display(self.request)
+        self.assertEqual(list_display[0].field_name, 'username')
+        self.assertEqual(list_display[2], 'full_name')
+        user = User(username="foo", is_staff=True)
+        self.assertEqual(list_display[1](user), field_to_string(User._meta.get_field('is_staff'), user))
+
+    def test_paginator_count(self):
+        """Tests that small tables are counted exactly.
+        """
+        from django.contrib.auth.models import User
+        User.objects.create(username="foo")
+        paginator = self.model_admin.get_paginator(self.request, User.objects.all(), 10)
+        self.assertEqual(paginator.count, 1)
+
+class ReplicaRouterCase(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.model = User
+        self.router = ReplicaRouter()
+
+    def tearDown(self):
+        pin_to_primary(False)
+
+    def test_weighted_replica(self):
+        """Tests that replicas with no weight are never chosen.
+        """
+        for i in range(10):
+            self.assertEqual(get_replica({'replica1': 0, 'replica2': 3}), 'replica2')
+
+    def test_no_replicas(self):
+        """Tests that without replicas reads go to the primary database.
+        """
+        self.assertEqual(get_replica({}), PRIMARY_DB_ALIAS)
+
+    def test_read_and_write_routing(self):
+        """Tests that reads go to replicas, and writes to the primary.
+        """
+        from django.test.utils import override_settings
+        with override_settings(DATABASE_REPLICAS={'replica1': 1}):
+            self.assertEqual(self.router.db_for_read(self.model), 'replica1')
+            self.assertEqual(self.router.db_for_write(self.model), PRIMARY_DB_ALIAS)
+            self.assertFalse(self.router.allow_syncdb('replica1', self.model))
+            with use_primary():
+                self.assertEqual(self.router.db_for_read(self.model), PRIMARY_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(self.model), 'replica1')
+
+    def test_read_through_replica(self):
+        """Tests that querysets really read from the replica alias.
+        """
+        from django.db import connections, router
+        from django.test.utils import override_settings
+        # Like TEST_MIRROR, but sharing the connection (and so the test
+        # transaction) of the primary database.
+        connections.databases['replica1'] = connections.databases[PRIMARY_DB_ALIAS]
+        setattr(connections._connections, 'replica1', connections[PRIMARY_DB_ALIAS])
+        routers = router.routers
+        router.routers = [self.router]
+        try:
+            with override_settings(DATABASE_REPLICAS={'replica1': 1}):
+                self.model.objects.create(username="foo")
+                with self.assertNumQueries(1, using='replica1'):
+                    user = self.model.objects.get(username="foo")
+                self.assertEqual(user._state.db, 'replica1')
+                with use_primary():
+                    self.assertEqual(self.model.objects.get(username="foo")._state.db, PRIMARY_DB_ALIAS)
+        finally:
+            router.routers = routers
+            delattr(connections._connections, 'replica1')
+            del connections.databases['replica1']
+
+    def test_pinning_after_post(self):
+        """Tests that reads are pinned to the primary after a POST.
+        """
+        from django.http import HttpResponse
+        middleware = ReplicaPinningMiddleware()
+        factory = RequestFactory()
+        request = factory.post("/")
+        middleware.process_request(request)
+        self.assertTrue(is_pinned_to_primary())
+        response = middleware.process_response(request, HttpResponse())
+        self.assertFalse(is_pinned_to_primary())
+        request = factory.get("/")
+        request.COOKIES[middleware.cookie_name] = response.cookies[middleware.cookie_name].value
+        middleware.process_request(request)
+        self.assertTrue(is_pinned_to_primary())
+
+class PersistentConnectionCase(TransactionTestCase):
+    def setUp(self):
+        import tempfile
+        from django.db import connections
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        # A file database, since in-memory ones are never closed.
+        connections.databases['persistent'] = dict(connections.databases[PRIMARY_DB_ALIAS], NAME=self.path)
+        self.conn = connections['persistent']
+
+    def tearDown(self):
+        from django.db import connections
+        self.conn.close()
+        delattr(connections._connections, 'persistent')
+        del connections.databases['persistent']
+        os.remove(self.path)
+
+    def test_max_age(self):
+        """Tests that connections survive requests until they are too old.
+        """
+        from django.test.utils import override_settings
+        with override_settings(DATABASE_CONN_MAX_AGE=60):
+            self.conn.cursor().execute("SELECT 1")
+            raw_connection = self.conn.connection
+            release_connections()
+            self.assertTrue(self.conn.connection is raw_connection)
+            self.conn.connected_at -= 120
+            release_connections()
+            self.assertTrue(self.conn.connection is None)
+
+    def test_health_check(self):
+        """Tests that broken connections are dropped when a request starts.
+        """
+        self.conn.cursor().execute("SELECT 1")
+        raw_connection = self.conn.connection
+        check_connections()
+        self.assertTrue(self.conn.connection is raw_connection)
+        raw_connection.close()
+        check_connections()
+        self.assertTrue(self.conn.connection is None)
+
+class MappedCatalogCase(TestCase):
+    def setUp(self):
+        import tempfile
+        from utils.translation import write_catalog
+        catalog = {
+            u'': u'Content-Type: text/plain; charset=UTF-8\n',
+            u'Yes': u'S\xec',
+            u'No': u'No',
+            (u'%d item', 0): u'%d elemento',
+            (u'%d item', 1): u'%d elementi',
+        }
+        fd, self.path = tempfile.mkstemp(suffix='.mo')
+        with os.fdopen(fd, 'wb') as f:
+            write_catalog(catalog, {'plural-forms': 'nplurals=2; plural=(n != 1);'}, f)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_singular_lookup(self):
+        """Tests looking up singular messages in a mapped catalog.
+        """
+        from utils.translation import MappedTranslation
+        t = MappedTranslation(self.path, 'it')
+        self.assertEqual(t.ugettext(u'Yes'), u'S\xec')
+        self.assertEqual(t.ugettext(u'Missing'), u'Missing')
+
+    def test_plural_lookup(self):
+        """Tests looking up plural messages in a mapped catalog.
+        """
+        from utils.translation import MappedTranslation
+        t = MappedTranslation(self.path, 'it')
+        self.assertEqual(t.ungettext(u'%d item', u'%d items', 1), u'%d elemento')
+        self.assertEqual(t.ungettext(u'%d item', u'%d items', 3), u'%d elementi')
+        self.assertEqual(t.ungettext(u'%d box', u'%d boxes', 3), u'%d boxes')
+
+class ConditionalGetCase(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.u1 = User.objects.create(username="u1")
+        self.u2 = User.objects.create(username="u2")
+
+    def _get(self, user=None, **kwargs):
+        from django.contrib.auth.models import AnonymousUser
+        headers = {}
+        etag = kwargs.pop('etag', None)
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        request = RequestFactory().get("/", **headers)
+        request.user = user or AnonymousUser()
+        return _ConditionalView.as_view()(request, **kwargs)
+
+    def _touch(self, user):
+        import datetime
+        user.last_login += datetime.timedelta(minutes=1)
+        user.save()
+
+    def test_not_modified(self):
+        """Tests that an unchanged object is not rendered again.
+        """
+        response = self._get(pk=self.u1.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertTrue("Cookie" in response["Vary"])
+        renders = _ConditionalView.renders
+        with self.assertNumQueries(1):
+            response = self._get(pk=self.u1.pk, etag=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(_ConditionalView.renders, renders)
+
+    def test_detail_modified(self):
+        """Tests that only changes of the displayed object invalidate its ETag.
+        """
+        etag = self._get(pk=self.u1.pk)["ETag"]
+        self._touch(self.u2)
+        self.assertEqual(self._get(pk=self.u1.pk, etag=etag).status_code, 304)
+        self._touch(self.u1)
+        self.assertEqual(self._get(pk=self.u1.pk, etag=etag).status_code, 200)
+
+    def test_list_modified(self):
+        """Tests that list ETags change when objects are changed or added.
+        """
+        from django.contrib.auth.models import User
+        etag = self._get()["ETag"]
+        self.assertEqual(self._get(etag=etag).status_code, 304)
+        User.objects.create(username="u3", last_login=self.u1.last_login)
+        response = self._get(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self._touch(self.u2)
+        self.assertEqual(self._get(etag=response["ETag"]).status_code, 200)
+
+    def test_vary_on_user(self):
+        """Tests that ETags are not shared between users.
+        """
+        etag = self._get(pk=self.u1.pk)["ETag"]
+        self.assertEqual(self._get(self.u2, pk=self.u1.pk, etag=etag).status_code, 200)
+
+    def test_missing_object(self):
+        """Tests that no ETag is sent when there is nothing to display.
+        """
+        self.assertFalse(self._get(pk=0).has_header("ETag"))
+
+class ProfilerCase(TestCase):
+    def setUp(self):
+        import tempfile
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.path)
+
+    def test_profile_matching_requests(self):
+        """Tests that requests matching the URL pattern are profiled and aggregated.
+        """
+        from StringIO import StringIO
+        from django.test.utils import override_settings
+        with override_settings(PROFILER_PATH=self.path, PROFILER_URL_PATTERN=r'^/slow/'):
+            middleware = ProfilerMiddleware()
+            factory = RequestFactory()
+            for path in ("/slow/", "/fast/"):
+                request = factory.get(path)
+                middleware.process_view(request, _ConditionalView.as_view(), (), {})
+                middleware.process_response(request, HttpResponse())
+        self.assertEqual(len(os.listdir(self.path)), 1)
+        output = StringIO()
+        call_command("profilestats", path=self.path, stdout=output)
+        self.assertTrue("1 profiles aggregated." in output.getvalue())
+
+    def test_disabled_by_default(self):
+        """Tests that the profiler is not used without a trigger.
+        """
+        from django.core.exceptions import MiddlewareNotUsed
+        from django.test.utils import override_settings
+        with override_settings(PROFILER_PATH=self.path):
+            self.assertRaises(MiddlewareNotUsed, ProfilerMiddleware)
+
+class RichFormCase(TestCase):
+    def setUp(self):
+        from django import forms as django_forms
+        class _Form(EnrichedForm):
+            name = django_forms.CharField()
+            notes = django_forms.CharField(required=False, label="Notes & remarks")
+        self.form_class = _Form
+
+    def test_enriched_class(self):
+        """Tests that the rendering plan is built when the class is created.
+        """
+        self.assertTrue(issubclass(self.form_class, RichForm))
+        self.assertTrue('_render_plan' in self.form_class.__dict__)
+        self.assertEqual(list(get_render_plan(self.form_class).keys()), ['name', 'notes'])
+
+    def test_enrich_form(self):
+        """Tests that the deprecated enrich_form returns a rich subclass.
+        """
+        import warnings
+        from django import forms as django_forms
+        class _Form(django_forms.Form):
+            name = django_forms.CharField()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            rich_form_class = enrich_form(_Form)
+        self.assertTrue(issubclass(caught[0].category, DeprecationWarning))
+        self.assertEqual(_Form.__bases__, (django_forms.Form,))
+        self.assertTrue(issubclass(rich_form_class, _Form))
+        self.assertTrue(issubclass(rich_form_class, RichForm))
+        self.assertTrue('_render_plan' in rich_form_class.__dict__)
+        self.assertTrue(isinstance(rich_form_class()['name'], RichBoundField))
+        self.assertEqual(rich_form_class()['name'].css_classes(), 'required')
+
+    def test_css_classes(self):
+        """Tests CSS classes of required and invalid fields.
+        """
+        form = self.form_class()
+        self.assertEqual(form['name'].css_classes(), 'required')
+        self.assertEqual(form['notes'].css_classes(), '')
+        form = self.form_class(data={})
+        self.assertEqual(form['name'].css_classes(), 'required errors')
+        self.assertEqual(form['notes'].css_classes(), '')
+
+    def test_label_tag(self):
+        """Tests that labels are rendered as standard bound fields do.
+        """
+        from django.forms.forms import BoundField
+        form = self.form_class(prefix="line-1")
+        for name in ('name', 'notes'):
+            self.assertEqual(form[name].label_tag(), BoundField(form, form.fields[name], name).label_tag())
+
+    def test_label_tag_without_id(self):
+        """Tests that labels without id are rendered as standard bound fields do.
+        """
+        from django.forms.forms import BoundField
+        form = self.form_class(auto_id=False)
+        for name in ('name', 'notes'):
+            self.assertEqual(form[name].label_tag(), BoundField(form, form.fields[name], name).label_tag())
+
+    def test_customized_field(self):
+        """Tests that fields changed per instance don't use the plan.
+        """
+        form = self.form_class()
+        form.fields['notes'].required = True
+        self.assertFalse(isinstance(form['notes'], RichBoundField))
+        self.assertEqual(form['notes'].css_classes(), 'required')
+
+class BulkImportCase(TransactionTestCase):
+    def setUp(self):
+        from django import forms as django_forms
+        from django.contrib.auth.models import User
+        class _UserForm(django_forms.ModelForm):
+            class Meta:
+                model = User
+                fields = ('username', 'email')
+        self.form_class = _UserForm
+
+    def test_import_csv(self):
+        """Tests that valid rows are created and invalid ones reported.
+        """
+        from StringIO import StringIO
+        from django.contrib.auth.models import User
+        from importers import import_file
+        data = StringIO("username,email\nfoo,foo@example.com\n,bar@example.com\nbaz,not-an-email\nqux,\n")
+        progress = []
+        result = import_file(self.form_class, data, 'csv', chunk_size=2, progress=lambda r: progress.append(r.processed))
+        self.assertEqual(result.processed, 4)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([number for number, errors in result.errors], [2, 3])
+        self.assertEqual(progress, [2, 4])
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['foo', 'qux'])
+
+    def test_import_jsonl_duplicates(self):
+        """Tests that duplicates within a chunk are reported per row.
+        """
+        from StringIO import StringIO
+        from importers import import_file
+        data = StringIO('{"username": "foo"}\n{"username": "foo"}\n')
+        result = import_file(self.form_class, data, 'jsonl')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([number for number, errors in result.errors], [2])
+
+    def test_import_with_processes(self):
+        """Tests that rows validated by worker processes are imported in order.
+        """
+        from importers import import_rows
+        rows = [{'report': 'r1', 'cache_key': 'k1'}, {'cache_key': 'k2'}, {'report': 'r3', 'cache_key': 'k3'}]
+        result = import_rows(_ReportJobImportForm, rows, chunk_size=1, processes=2)
+        self.assertEqual(result.processed, 3)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([number for number, errors in result.errors], [2])
+        self.assertEqual(list(ReportJob.objects.order_by('pk').values_list('report', flat=True)), ['r1', 'r3'])
+
+    def test_rejected_form_classes(self):
+        """Tests that M2M fields and (with processes) local classes are rejected.
+        """
+        from django import forms as django_forms
+        from django.contrib.auth.models import User
+        from importers import import_rows
+        class _GroupsForm(django_forms.ModelForm):
+            class Meta:
+                model = User
+                fields = ('username', 'groups')
+        self.assertRaises(ValueError, import_rows, _GroupsForm, [])
+        self.assertRaises(ValueError, import_rows, self.form_class, [], processes=2)
+
+class GlobalSearchCase(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        import search
+        search.register(User, ('username', 'first_name', 'last_name'), {'username': 3})
+        search.register(Group, ('name',))
+        self.search = search
+        self.admin = User.objects.create(username="admin", is_superuser=True)
+        User.objects.create(username="jsmith", first_name="John", last_name="Smith")
+        User.objects.create(username="jdoe", first_name="John", last_name="Doe")
+        Group.objects.create(name="Smith family")
+
+    def tearDown(self):
+        from django.contrib.auth.models import User, Group
+        for model in (User, Group):
+            post_save.disconnect(sender=model, dispatch_uid="search_index_%s" % model._meta)
+            post_delete.disconnect(sender=model, dispatch_uid="search_unindex_%s" % model._meta)
+            del self.search._registry[model]
+
+    def test_tokenize(self):
+        """Tests that text is split in lowercase terms.
+        """
+        self.assertEqual(self.search.tokenize(u"John O. Smith-Doe"), [u"john", u"smith", u"doe"])
+
+    def test_grouped_results(self):
+        """Tests that matches are grouped by model.
+        """
+        results = dict(self.search.search("smith", self.admin))
+        from django.contrib.auth.models import User, Group
+        self.assertEqual([u.username for u in results[User]], ["jsmith"])
+        self.assertEqual([g.name for g in results[Group]], ["Smith family"])
+
+    def test_all_terms_and_prefix(self):
+        """Tests that all the terms must match, the last one as prefix.
+        """
+        results = self.search.search("john do", self.admin)
+        self.assertEqual([[o.username for o in objects] for model, objects in results], [["jdoe"]])
+
+    def test_each_term_must_match(self):
+        """Tests that terms are matched separately, not by number of postings.
+        """
+        from django.contrib.auth.models import User
+        User.objects.create(username="jjones", first_name="John", last_name="Jones")
+        results = self.search.search("smith jo", self.admin)
+        self.assertEqual([[o.username for o in objects] for model, objects in results], [["jsmith"]])
+
+    def test_ranking_and_limit(self):
+        """Tests that results are ranked by weight and limited by the query.
+        """
+        from django.contrib.auth.models import User
+        User.objects.create(username="johnny")
+        results = self.search.search("john", self.admin, limit=1)
+        self.assertEqual([[o.username for o in objects] for model, objects in results], [["johnny"]])
+        usernames = [o.username for o in self.search.search("jo", self.admin)[0][1]]
+        self.assertEqual(usernames[0], "johnny")
+        self.assertEqual(sorted(usernames[1:]), ["jdoe", "jsmith"])
+
+    def test_unindex_on_delete(self):
+        """Tests that deleted objects are removed from the index.
+        """
+        from django.contrib.auth.models import User
+        User.objects.get(username="jsmith").delete()
+        self.assertEqual(dict(self.search.search("smith", self.admin)).get(User), None)
+
+    def test_permissions(self):
+        """Tests that users only search the models they can change.
+        """
+        from django.contrib.auth.models import AnonymousUser
+        self.assertEqual(self.search.search("smith", AnonymousUser()), [])
+        self.assertEqual(self.search.search("smith", None), [])
+        self.assertEqual(Template("{% load search %}{% search_results 'smith' as results %}{{ results|length }}").render(Context()), "0")
+        self.assertEqual(len(self.search.search("smith", self.admin)), 2)
+
+    def test_rebuild(self):
+        """Tests rebuilding the index in batches.
+        """
+        from django.contrib.auth.models import User
+        SearchIndexEntry.objects.all().delete()
+        self.assertEqual(self.search.rebuild_index(User, batch_size=2), 3)
+        self.assertEqual(len(self.search.search("john", self.admin)), 1)
@@ -15,9 +15,13 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
-from django.conf.urls import patterns
+from django.conf.urls import patterns, url
 from django.views.generic import TemplateView
 
+from views import ReportJobStatusView, SearchView
+
 urlpatterns = patterns('',
     (r'^$', TemplateView.as_view(template_name="index.html")),
+    url(r'^search/$', SearchView.as_view(), name='search'),
+    url(r'^reports/jobs/(?P<pk>\d+)/$', ReportJobStatusView.as_view(), name='report_job_status'),
 )
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import re
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db import models
+from django.db.models import Q
+
+CURSOR_SALT = 'djangoerp.core.utils.pagination'
+
+DEFAULT_ESTIMATE_COUNT_THRESHOLD = 10000
+
+_EXPLAIN_ROWS_RE = re.compile(r'rows=(\d+)')
+
+def encode_cursor(values, reverse=False):
+    """Returns an opaque (and signed) cursor for the given ordering values.
+    """
+    return signing.dumps({'v': list(values), 'r': bool(reverse)}, salt=CURSOR_SALT, compress=True)
+
+def decode_cursor(cursor):
+    """Returns the (values, reverse) pair stored in the given cursor.
+
+    If the cursor is missing, malformed or tampered, (None, False) is returned.
+    """
+    if not cursor:
+        return None, False
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        return list(data['v']), bool(data['r'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None, False
+
+def normalize_ordering(model, ordering):
+    """Returns the given ordering with the primary key as final tie-breaker.
+
+    Each item of the returned list is a (field_name, descending) pair. Only
+    local fields of model are supported: related orderings (i.e.
+    "customer__name") raise ImproperlyConfigured.
+    """
+    result = []
+    pk_name = model._meta.pk.name
+    for item in ordering:
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = pk_name
+        if '__' in name:
+            raise ImproperlyConfigured("Keyset ordering on related fields is not supported: %s" % item)
+        try:
+            model._meta.get_field(name)
+        except models.FieldDoesNotExist:
+            raise ImproperlyConfigured("Keyset ordering on unknown field: %s" % item)
+        result.append((name, descending))
+    if pk_name not in [name for name, descending in result]:
+        last_descending = result[-1][1] if result else False
+        result.append((pk_name, last_descending))
+    return result
+
+def keyset_filter(ordering, values, reverse=False):
+    """Returns a Q object which selects the rows following the given values.
+
+    The rows are selected according to the given normalized ordering, or to
+    its opposite if reverse is True. The generated lookups only touch the
+    ordering columns, so an index on them makes every page equally cheap.
+
+    NOTE: ordering columns are expected to be NOT NULL.
+    """
+    q = Q()
+    for i, (name, descending) in enumerate(ordering):
+        lookup = 'lt' if (descending != reverse) else 'gt'
+        clause = Q(**{'%s__%s' % (name, lookup): values[i]})
+        for j, (prev_name, prev_descending) in enumerate(ordering[:i]):
+            clause &= Q(**{prev_name: values[j]})
+        q |= clause
+    return q
+
+def ordering_values(obj, ordering):
+    """Returns the serializable values of the ordering fields of obj.
+    """
+    opts = obj._meta
+    return [opts.get_field(name).value_to_string(obj) for name, descending in ordering]
+
+def estimated_count(queryset, threshold=None):
+    """Returns the planner estimated number of rows of the given queryset.
+
+    Estimates are only available on PostgreSQL; on other backends, or when the
+    estimate is lower than threshold, the exact COUNT(*) is returned.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    cursor = connection.cursor()
+    cursor.execute('EXPLAIN %s' % sql, params)
+    match = _EXPLAIN_ROWS_RE.search(cursor.fetchone()[0])
+
+    if not match:
+        return queryset.count()
+
+    estimate = int(match.group(1))
+    if threshold is not None and estimate < threshold:
+        return queryset.count()
+    return estimate
+
+class KeysetPage(object):
+    """A page of results of a keyset (cursor) paginated queryset.
+
+    It exposes a subset of the interface of Django's Page, so the usual
+    "page_obj.has_next" and friends still work in templates.
+    """
+    def __init__(self, object_list, queryset, ordering, has_next, has_previous, estimate_count=False, estimate_count_threshold=DEFAULT_ESTIMATE_COUNT_THRESHOLD):
+        self.object_list = object_list
+        self.queryset = queryset
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.estimate_count = estimate_count
+        self.estimate_count_threshold = estimate_count_threshold
+        self._count = None
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next() and self.object_list):
+            return None
+        return encode_cursor(ordering_values(self.object_list[-1], self.ordering))
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous() and self.object_list):
+            return None
+        return encode_cursor(ordering_values(self.object_list[0], self.ordering), reverse=True)
+
+    @property
+    def count(self):
+        """The total number of objects (lazily evaluated, maybe estimated).
+
+        Estimates below estimate_count_threshold are replaced by exact counts.
+        """
+        if self._count is None:
+            if self.estimate_count:
+                self._count = estimated_count(self.queryset, self.estimate_count_threshold)
+            else:
+                self._count = self.queryset.count()
+        return self._count
+
+def paginate_by_keyset(queryset, ordering, page_size, cursor=None, estimate_count=False, estimate_count_threshold=DEFAULT_ESTIMATE_COUNT_THRESHOLD):
+    """Returns the KeysetPage of queryset which follows the given cursor.
+
+    Only page_size + 1 rows are fetched, whatever the position of the page.
+    """
+    ordering = normalize_ordering(queryset.model, ordering)
+    values, reverse = decode_cursor(cursor)
+
+    order_by = []
+    for name, descending in ordering:
+        order_by.append(('-%s' if (descending != reverse) else '%s') % name)
+
+    page_qs = queryset.order_by(*order_by)
+    if values is not None and len(values) == len(ordering):
+        page_qs = page_qs.filter(keyset_filter(ordering, values, reverse))
+    else:
+        values, reverse = None, False
+
+    object_list = list(page_qs[:page_size + 1])
+    has_more = len(object_list) > page_size
+    object_list = object_list[:page_size]
+
+    if reverse:
+        object_list.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, values is not None
+
+    return KeysetPage(object_list, queryset, ordering, has_next, has_previous, estimate_count, estimate_count_threshold)
@@ -15,6 +15,7 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
+from django.conf import settings
 from django.utils.formats import localize
 from django.utils.safestring import mark_safe
 from django.template.loader import render_to_string
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This file is part of the django ERP project.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+__author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
+__copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
+__version__ = '0.0.1'
+
+import os
+import mmap
+import struct
+import gettext
+from django.conf import settings
+from django.utils.translation import trans_real
+
+MO_MAGIC = 0x950412de
+
+def write_catalog(catalog, info, fileobj):
+    """Writes a merged catalog in the GNU MO format.
+
+    catalog is a gettext catalog (as GNUTranslations._catalog), so plural
+    forms are keyed by (msgid, index) pairs. Since the catalog doesn't keep
+    the original plural msgids, plural entries are written as "msgid\\0".
+    Entries are sorted, so they can be binary searched (see MappedCatalog).
+    """
+    entries = {}
+    plurals = {}
+    for key, value in catalog.items():
+        if isinstance(key, tuple):
+            plurals.setdefault(key[0], {})[key[1]] = value
+        elif key:
+            entries[key.encode('utf-8')] = value.encode('utf-8')
+    for msgid, forms in plurals.items():
+        entries[msgid.encode('utf-8') + b'\x00'] = b'\x00'.join([forms[i].encode('utf-8') for i in sorted(forms)])
+
+    header = 'Content-Type: text/plain; charset=UTF-8\n'
+    if 'plural-forms' in info:
+        header += 'Plural-Forms: %s\n' % info['plural-forms']
+    entries[b''] = header.encode('utf-8')
+
+    keys = sorted(entries.keys())
+    count = len(keys)
+    originals_offset = 28
+    translations_offset = originals_offset + count * 8
+    data_offset = translations_offset + count * 8
+
+    originals = []
+    translations = []
+    data = []
+    for key in keys:
+        originals.append((len(key), data_offset))
+        data.append(key + b'\x00')
+        data_offset += len(key) + 1
+    for key in keys:
+        value = entries[key]
+        translations.append((len(value), data_offset))
+        data.append(value + b'\x00')
+        data_offset += len(value) + 1
+
+    fileobj.write(struct.pack('<7I', MO_MAGIC, 0, count, originals_offset, translations_offset, 0, data_offset))
+    for length, offset in originals + translations:
+        fileobj.write(struct.pack('<2I', length, offset))
+    fileobj.write(b''.join(data))
+
+class MappedCatalog(object):
+    """Read-only gettext catalog backed by a memory-mapped MO file.
+
+    Nothing is parsed up-front: lookups are binary searches on the mapped
+    (sorted) file, so forked workers share the same memory pages.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, revision, self._count, self._originals, self._translations = struct.unpack('<5I', self._map[:20])
+        if magic != MO_MAGIC:
+            raise IOError("Bad magic number in %s" % path)
+
+    def _string(self, table, index):
+        length, offset = struct.unpack('<2I', self._map[table + index * 8:table + index * 8 + 8])
+        return self._map[offset:offset + length]
+
+    def _bisect(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(self._originals, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _lookup(self, key):
+        if isinstance(key, tuple):
+            msgid, index = key
+            prefix = msgid.encode('utf-8') + b'\x00'
+            i = self._bisect(prefix)
+            if i < self._count and self._string(self._originals, i).startswith(prefix):
+                forms = self._string(self._translations, i).split(b'\x00')
+                if index < len(forms):
+                    return forms[index].decode('utf-8')
+            return None
+        key = key.encode('utf-8')
+        i = self._bisect(key)
+        if i < self._count and self._string(self._originals, i) == key:
+            return self._string(self._translations, i).decode('utf-8')
+        return None
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is None:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __len__(self):
+        return self._count
+
+    def keys(self):
+        result = []
+        for i in range(self._count):
+            original = self._string(self._originals, i)
+            if b'\x00' in original:
+                msgid = original.split(b'\x00')[0].decode('utf-8')
+                forms = self._string(self._translations, i).split(b'\x00')
+                result.extend([(msgid, n) for n in range(len(forms))])
+            else:
+                result.append(original.decode('utf-8'))
+        return result
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def header(self):
+        return self.get(u'', u'')
+
+class MappedTranslation(trans_real.DjangoTranslation):
+    """DjangoTranslation whose catalog is a MappedCatalog.
+    """
+    def __init__(self, path, language):
+        trans_real.DjangoTranslation.__init__(self)
+        self._catalog = MappedCatalog(path)
+        self._charset = 'utf-8'
+        for line in self._catalog.header().splitlines():
+            if ':' in line:
+                k, v = line.split(':', 1)
+                self._info[k.strip().lower()] = v.strip()
+        if 'plural-forms' in self._info:
+            self.plural = gettext.c2py(self._info['plural-forms'].split(';')[1].split('plural=')[1])
+        else:
+            self.plural = lambda n: int(n != 1)
+        self.set_language(language)
+
+def get_compiled_catalog_path(language, path=None):
+    return os.path.join(path or settings.COMPILED_LOCALE_PATH, '%s.mo' % language)
+
+def load_compiled_catalogs(path=None):
+    """Installs the compiled catalogs (see the compilecatalogs command).
+
+    Call it before the workers are forked (i.e. in the WSGI module), so all of
+    them share the same mapped catalogs. Languages without a compiled catalog
+    keep using the standard Django loading.
+    """
+    for language, name in settings.LANGUAGES:
+        catalog_path = get_compiled_catalog_path(language, path)
+        if os.path.exists(catalog_path):
+            trans_real._translations[language] = MappedTranslation(catalog_path, language)
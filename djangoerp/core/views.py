@@ -15,7 +15,19 @@ __author__ = 'Emanuele Bertoldi <emanuele.bertoldi@gmail.com>'
 __copyright__ = 'Copyright (c) 2013 Emanuele Bertoldi'
 __version__ = '0.0.1'
 
+import json
+import hashlib
+from django.db.models import Max, Count
+from django.http import HttpResponse, Http404
+from django.utils import translation
+from django.utils.cache import patch_vary_headers, patch_cache_control
+from django.views.decorators.http import condition
+from django.views.generic import View, TemplateView
+
+from models import ReportJob
+from search import search
 from utils import clean_http_referer
+from utils.pagination import DEFAULT_ESTIMATE_COUNT_THRESHOLD, KeysetPage, paginate_by_keyset
 
 class SetCancelUrlMixin(object):
     """Mixin that allows setting an URL to the previous logical view.
@@ -48,3 +60,145 @@ class SetSuccessUrlMixin(object):
             return self.request.GET.get('next', self.success_url or clean_http_referer(self.request))
         except:
             return super(SetSuccessUrlMixin, self).get_success_url()
+
+class KeysetPaginationMixin(object):
+    """Mixin that paginates a list view by keyset (a.k.a. cursor).
+
+    Instead of OFFSET, each page is located by the values of the ordering
+    fields of the last (or first) object of the previous one, so deep pages
+    cost the same as the first one. The ordering should match an index.
+
+    It adds two context variables called "next_page_url" and
+    "previous_page_url" which preserve the other query parameters (i.e. the
+    "back" and "next" ones). If "estimate_count" is True, "page_obj.count"
+    is estimated by the database planner instead of counted, unless the
+    estimate is lower than "estimate_count_threshold".
+    """
+    keyset_ordering = ('-pk',)
+    cursor_kwarg = 'cursor'
+    estimate_count = False
+    estimate_count_threshold = DEFAULT_ESTIMATE_COUNT_THRESHOLD
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.kwargs.get(self.cursor_kwarg) or self.request.GET.get(self.cursor_kwarg)
+        page = paginate_by_keyset(queryset, self.get_keyset_ordering(), page_size, cursor, self.estimate_count, self.estimate_count_threshold)
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_cursor_url(self, cursor):
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor
+        return '?%s' % params.urlencode()
+
+    def get_context_data(self, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if isinstance(page, KeysetPage):
+            next_cursor = page.next_cursor
+            previous_cursor = page.previous_cursor
+            context['next_page_url'] = next_cursor and self.get_cursor_url(next_cursor)
+            context['previous_page_url'] = previous_cursor and self.get_cursor_url(previous_cursor)
+        return context
+
+class ReportJobStatusView(View):
+    """Returns the status of a report job as JSON, for progress polling.
+
+    Only the user who requested the report (or a superuser) can see it;
+    internal jobs (without user) are visible to superusers only.
+    """
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated():
+            raise Http404
+
+        try:
+            job = ReportJob.objects.get(pk=kwargs['pk'])
+        except ReportJob.DoesNotExist:
+            raise Http404
+
+        if (job.user_id is None or job.user_id != request.user.pk) and not request.user.is_superuser:
+            raise Http404
+
+        data = {
+            'status': job.status,
+            'progress': job.progress,
+            'url': job.result_url,
+        }
+        return HttpResponse(json.dumps(data), content_type='application/json')
+
+class ConditionalGetMixin(object):
+    """Mixin that answers "304 Not Modified" to unchanged GET requests.
+
+    The ETag is derived from the latest "last_modified_field" value (and the
+    number) of the displayed objects: the one identified by the URL on detail
+    views, the whole queryset on list views. Since both come from a single
+    aggregate query, unchanged pages are never rendered again.
+
+    If "vary_on_user" is True, the ETag includes the current user and the
+    response is marked as private and varying on cookies; in that case no
+    Last-Modified header is sent, as it can't tell users apart.
+    """
+    last_modified_field = None
+    vary_on_user = True
+
+    def get_condition_queryset(self):
+        queryset = self.get_queryset()
+        pk = self.kwargs.get(getattr(self, 'pk_url_kwarg', 'pk'))
+        slug = self.kwargs.get(getattr(self, 'slug_url_kwarg', 'slug'))
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        elif slug is not None:
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        return queryset
+
+    def get_condition_values(self):
+        """Returns the (last modification, number of objects) pair.
+        """
+        if not hasattr(self, '_condition_values'):
+            values = self.get_condition_queryset().aggregate(last_modified=Max(self.last_modified_field), count=Count('pk'))
+            self._condition_values = (values['last_modified'], values['count'])
+        return self._condition_values
+
+    def get_last_modified(self):
+        if self.vary_on_user:
+            return None
+        return self.get_condition_values()[0]
+
+    def get_etag(self):
+        last_modified, count = self.get_condition_values()
+        if last_modified is None:
+            return None
+        parts = [self.request.get_full_path(), last_modified.isoformat(), count, translation.get_language()]
+        if self.vary_on_user:
+            parts.append(self.request.user.pk)
+        return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.last_modified_field or request.method not in ('GET', 'HEAD'):
+            return super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+
+        view = condition(
+            etag_func=lambda request, *args, **kwargs: self.get_etag(),
+            last_modified_func=lambda request, *args, **kwargs: self.get_last_modified(),
+        )(super(ConditionalGetMixin, self).dispatch)
+        response = view(request, *args, **kwargs)
+
+        if self.vary_on_user:
+            patch_vary_headers(response, ('Cookie',))
+            patch_cache_control(response, private=True)
+        return response
+
+class SearchView(TemplateView):
+    """Global search across the models registered in djangoerp.core.search.
+
+    It adds two context variables called "query" and "results" (a list of
+    model/objects pairs, by relevance).
+    """
+    template_name = 'search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['results'] = search(context['query'], self.request.user)
+        return context
@@ -44,6 +44,10 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djangoerp.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Memory-maps the merged translation catalogs (if compiled) before forking.
+from djangoerp.core.utils.translation import load_compiled_catalogs
+load_compiled_catalogs()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)